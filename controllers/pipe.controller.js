@@ -2,6 +2,10 @@ import pool from "../storage/mysql.storage.js";
 import dayjs from "dayjs";
 import { spawn } from "child_process";
 import fs from "fs";
+import predictionPool, {
+  jmrPool,
+  playbackPool,
+} from "../utils/predictionpool.utils.js";
 const pipeController = () => {
   const getTrunklines = async (req, res) => {
     try {
@@ -175,107 +179,94 @@ const pipeController = () => {
         });
       }
 
-      const results = [];
       const table = req.user.data_table;
+      const dateOnlys = [...new Set(dates.map((date) => date.split(" ")[0]))];
+      const today = dayjs().format("YYYY-MM-DD");
+      const dateRanges = (days) =>
+        days
+          .map(() => "(timestamp >= ? AND timestamp < ? + INTERVAL 1 DAY)")
+          .join(" OR ");
+      const dateParams = (days) => days.flatMap((day) => [day, day]);
+
+      // Hari yang sudah lewat dibaca dari cache histori di disk; jumlah baris per tanggal
+      // dipakai untuk mendeteksi baris yang datang terlambat
+      const pastDays = dateOnlys.filter((day) => day < today);
+      const dayCounts = {};
+      if (pastDays.length > 0) {
+        const [countRows] = await pool.query(
+          `SELECT DATE_FORMAT(timestamp, '%Y-%m-%d') AS day, COUNT(*) AS total
+          FROM ${pool.escapeId(table)}
+          WHERE ${dateRanges(pastDays)}
+          GROUP BY day`,
+          dateParams(pastDays)
+        );
+        for (const row of countRows) dayCounts[row.day] = Number(row.total);
+      }
 
-      // Buat placeholders untuk IN clause
-      const spotPlaceholders = spots.map(() => "?").join(",");
+      const status = await playbackPool.request(
+        { op: "history_status", table, dates: dateOnlys, day_counts: dayCounts, today },
+        table
+      );
+      if (!status.success) {
+        return res.status(400).json({ success: false, message: status.message });
+      }
 
-      for (const date of dates) {
-        const dateOnly = date.split(" ")[0];
+      // Satu query untuk semua tanggal basi: hari yang sudah lewat diambil untuk semua spot
+      // (disimpan ke cache), hari ini cukup spot yang diminta
+      const staleDays = status.stale;
+      const stalePast = staleDays.filter((day) => day < today);
+      const staleCurrent = staleDays.filter((day) => day >= today);
+      const conditions = [];
+      const queryParams = [];
+      if (stalePast.length > 0) {
+        conditions.push(`(${dateRanges(stalePast)})`);
+        queryParams.push(...dateParams(stalePast));
+      }
+      if (staleCurrent.length > 0) {
+        const spotPlaceholders = spots.map(() => "?").join(",");
+        conditions.push(
+          `((${dateRanges(staleCurrent)}) AND spot_id IN (${spotPlaceholders}))`
+        );
+        queryParams.push(...dateParams(staleCurrent), ...spots);
+      }
 
+      const columns = { spot_id: [], timestamp: [], psi: [] };
+      if (conditions.length > 0) {
         const query = `
-        SELECT 
-          spot_id AS idSpot,
-          AVG(psi) AS avgPsiValues,
-          time_bucket
-        FROM (
-          SELECT 
+          SELECT
             spot_id,
-            psi,
-            FLOOR((HOUR(timestamp) * 60 + MINUTE(timestamp)) / ?) AS time_bucket
-          FROM 
+            TIMESTAMPDIFF(SECOND, '1970-01-01 00:00:00', timestamp) AS seconds,
+            psi
+          FROM
             ${pool.escapeId(table)}
-          WHERE 
-            DATE(timestamp) = ?
-            AND spot_id IN (${spotPlaceholders})
-        ) AS bucketed_data
-        GROUP BY 
-          spot_id,
-          time_bucket
-        ORDER BY 
-          time_bucket,
-          spot_id
-      `;
-
-        const queryParams = [timeRange, dateOnly, ...spots];
-
-        const [rows] = await pool.execute(query, queryParams);
-
-        // Group by time_bucket dulu, baru per spot
-        const timeGroups = {};
-
-        rows.forEach((row) => {
-          const bucket = row.time_bucket;
-
-          // Hitung start dan end time dari bucket
-          const startMinutes = bucket * timeRange;
-          const endMinutes = startMinutes + timeRange;
-
-          const startHour = String(Math.floor(startMinutes / 60)).padStart(
-            2,
-            "0"
-          );
-          const startMin = String(startMinutes % 60).padStart(2, "0");
-          const endHour = String(Math.floor(endMinutes / 60)).padStart(2, "0");
-          const endMin = String(endMinutes % 60).padStart(2, "0");
-
-          const timeRangeStr = `${startHour}:${startMin} - ${endHour}:${endMin}`;
-
-          if (!timeGroups[bucket]) {
-            timeGroups[bucket] = {
-              timeRange: timeRangeStr,
-              dateFilter: dateOnly,
-              data: {},
-            };
-          }
-
-          timeGroups[bucket].data[row.idSpot] = parseFloat(row.avgPsiValues);
-        });
-
-        // Convert ke array dan push ke results, pastiin semua spot ada
-        Object.keys(timeGroups)
-          .sort((a, b) => Number(a) - Number(b))
-          .forEach((bucket) => {
-            const dataArray = spots.map((spot) => ({
-              idSpot: spot,
-              avgPsiValues: timeGroups[bucket].data[spot] || 0,
-            }));
-
-            results.push({
-              timeRange: timeGroups[bucket].timeRange + " | " + dateOnly,
-              dateFilter: dateOnly,
-              data: dataArray,
-            });
-          });
+          WHERE
+            ${conditions.join(" OR ")}
+        `;
+        const [rows] = await pool.query({ sql: query, rowsAsArray: true }, queryParams);
+        for (const [spotId, seconds, psi] of rows) {
+          columns.spot_id.push(spotId);
+          columns.timestamp.push(Number(seconds));
+          columns.psi.push(psi === null ? null : Number(psi));
+        }
       }
 
-      let categories = results.map((r) => r.timeRange);
-      let series = spots.map((spot) => {
-        return {
-          idSpot: spot,
-          data: results.map((r) => {
-            const spotData = r.data.find((d) => d.idSpot === spot);
-            return spotData ? spotData.avgPsiValues : 0;
-          }),
-        };
-      });
+      const output = await playbackPool.request(
+        {
+          dates,
+          timeRange,
+          spots,
+          table,
+          today,
+          fetched: staleDays,
+          rows: columns,
+        },
+        table
+      );
+      if (!output.success) {
+        return res.status(400).json({ success: false, message: output.message });
+      }
 
-      return res.status(200).json({
-        success: true,
-        data: results,
-        chartData: { categories, series },
-      });
+      return res.status(200).json(output);
     } catch (err) {
       console.error("Error:", err);
       return res.status(500).json({
@@ -320,6 +311,7 @@ const pipeController = () => {
         infix,
         training_feature || null,
       ]);
+      compileModel(modelFilename);
 
       return res
         .status(200)
@@ -397,7 +389,7 @@ const pipeController = () => {
 
   const executePrediction = async (req, res) => {
     try {
-      const { token, delta, tline_length } = req.body;
+      const { token, delta, tline_length, timings } = req.body;
       //Cek token valid
       const q = "SELECT * FROM prediction_result WHERE token = ?";
       const [rows] = await pool.execute(q, [token]);
@@ -432,16 +424,16 @@ const pipeController = () => {
         n++;
       }
       console.log(inputData);
-      const result = await runModel(
+      const resultParsed = await runModel(
         modelParameters,
         modelFilename,
         inputData,
         tline_length,
         model.infix,
         modelOutput,
-        trainingFeature || ""
+        trainingFeature || "",
+        Boolean(timings)
       );
-      const resultParsed = JSON.parse(result.trim());
       const leakSpot = resultParsed.result.lokasi;
       const leakStatus = resultParsed.result.status === "kebocoran" ? 1 : 0;
 
@@ -458,60 +450,207 @@ const pipeController = () => {
         success: true,
         message: "Prediction executed",
         result: resultParsed.result,
+        ...(timings && { timings: resultParsed.timings }),
+      });
+    } catch (err) {
+      return res.status(500).json({ success: false, message: err.message });
+    }
+  };
+
+  // Batch: banyak delta (array 2D, urutan kolom = parameter 1..n) ke satu model dalam satu predict
+  const executePredictionBatch = async (req, res) => {
+    try {
+      const { token, deltas, tline_length, timings } = req.body;
+      if (!Array.isArray(deltas) || deltas.length === 0) {
+        return res.status(400).json({
+          success: false,
+          message: "deltas harus berupa array dan tidak boleh kosong",
+        });
+      }
+
+      const q = "SELECT * FROM prediction_result WHERE token = ?";
+      const [rows] = await pool.execute(q, [token]);
+      if (rows.length === 0) {
+        return res
+          .status(400)
+          .json({ success: false, message: "Invalid token" });
+      }
+
+      const qModel = "SELECT * FROM models WHERE id_model = ?";
+      const [modelRows] = await pool.execute(qModel, [rows[0].id_model]);
+      if (modelRows.length === 0) {
+        return res
+          .status(400)
+          .json({ success: false, message: "Model not found for this token" });
+      }
+
+      const model = modelRows[0];
+      const response = await runModelBatch(
+        model.parameters,
+        model.model_filename,
+        deltas,
+        tline_length,
+        model.infix,
+        model.output,
+        model.training_feature || "",
+        Boolean(timings)
+      );
+
+      const updateDate = dayjs().format("YYYY-MM-DD HH:mm:ss");
+      const updateQ =
+        "UPDATE prediction_result SET timestamp = ? WHERE token = ?";
+      await pool.execute(updateQ, [updateDate, token]);
+
+      return res.status(200).json({
+        success: true,
+        message: "Batch prediction executed",
+        results: response.results,
+        ...(timings && { timings: response.timings }),
+      });
+    } catch (err) {
+      return res.status(500).json({ success: false, message: err.message });
+    }
+  };
+
+  // Compare: satu delta ke semua model trunkline (atau subset id_model di "models") dalam satu
+  // request worker; predict per model jalan paralel di thread pool prediction.py
+  const compareModels = async (req, res) => {
+    try {
+      const { id_tline, delta, tline_length, models } = req.body;
+      if (!Array.isArray(delta) || delta.length === 0) {
+        return res.status(400).json({
+          success: false,
+          message: "delta harus berupa array dan tidak boleh kosong",
+        });
+      }
+
+      const q = "SELECT * FROM models WHERE id_tline = ?";
+      const [rows] = await pool.execute(q, [id_tline]);
+      const selected = Array.isArray(models)
+        ? rows.filter((m) => models.map(String).includes(String(m.id_model)))
+        : rows;
+      if (selected.length === 0) {
+        return res
+          .status(400)
+          .json({ success: false, message: "Model not found for this trunkline" });
+      }
+
+      const response = await predictionPool.request(
+        {
+          op: "compare",
+          models: selected.map((m) => [
+            m.parameters,
+            m.model_filename,
+            tline_length,
+            m.infix,
+            m.output,
+            m.training_feature || "",
+          ]),
+          delta,
+        },
+        `compare:${id_tline}`
+      );
+      if (response.status !== "success") {
+        throw new Error(`Model error: ${response.message}`);
+      }
+
+      return res.status(200).json({
+        success: true,
+        message: "Model comparison executed",
+        results: response.results.map((result, i) => ({
+          id_model: selected[i].id_model,
+          model_name: selected[i].model_name,
+          model_filename: selected[i].model_filename,
+          ...result,
+        })),
+        agreement: response.agreement,
       });
     } catch (err) {
       return res.status(500).json({ success: false, message: err.message });
     }
   };
 
-  const runModel = (
+  // Compile model sekali setelah upload (artifact mmap, lihat models/model_artifact.py).
+  // Gagal compile tidak fatal: prediction.py tetap bisa load dari pickle.
+  const compileModel = (modelFilename) => {
+    const compile = spawn("python3", [
+      "models/prediction.py",
+      "--compile",
+      modelFilename,
+    ]);
+    let stdout = "";
+    compile.stdout.on("data", (data) => {
+      stdout += data.toString();
+    });
+    compile.on("close", (code) => {
+      if (code !== 0) {
+        console.error(`Compile model ${modelFilename} gagal: ${stdout.trim()}`);
+      }
+    });
+    compile.on("error", (err) => {
+      console.error(`Compile model ${modelFilename} gagal: ${err.message}`);
+    });
+  };
+
+  const runModel = async (
     parameters,
     path,
     inputData,
     tlineLength,
     infix,
     output,
-    trainingFeature
+    trainingFeature,
+    timings = false
   ) => {
-    return new Promise((resolve, reject) => {
-      const model = spawn("python3", [
-        "models/prediction.py",
-        parameters,
-        path,
-        tlineLength,
-        infix,
-        output,
-        trainingFeature,
-      ]);
-      let stdout = "";
-      let stderr = "";
-
-      model.stdout.on("data", (data) => {
-        const text = data.toString();
-        stdout += text;
-        // const result = JSON.parse(text.trim());
-      });
-
-      model.stderr.on("data", (data) => {
-        const text = data.toString();
-        stderr += text;
-        console.error(`Model stderr: ${text.trim()}`);
-      });
-
-      model.on("close", (code) => {
-        if (code === 0) {
-          resolve(stdout);
-        } else {
-          reject(
-            new Error(`Model process exited with code ${code}: ${stderr}`)
-          );
-        }
-      });
+    // Dikirim ke worker prediction.py yang sudah jalan (lihat predictionpool.utils.js)
+    // timings: worker menambahkan durasi per stage + counter ke response,
+    // roundtrip_ms = waktu di sisi Node (antrian pool + IPC + worker)
+    const start = process.hrtime.bigint();
+    const response = await predictionPool.request(
+      {
+        args: [parameters, path, tlineLength, infix, output, trainingFeature],
+        data: inputData,
+        timings,
+      },
+      path
+    );
+    if (response.timings) {
+      response.timings.roundtrip_ms =
+        Number(process.hrtime.bigint() - start) / 1e6;
+    }
+    if (response.status !== "success") {
+      throw new Error(`Model error: ${response.message}`);
+    }
+    return response;
+  };
 
-      // Kirim input JSON ke Python stdin
-      model.stdin.write(JSON.stringify(inputData));
-      model.stdin.end();
-    });
+  const runModelBatch = async (
+    parameters,
+    path,
+    rows,
+    tlineLength,
+    infix,
+    output,
+    trainingFeature,
+    timings = false
+  ) => {
+    const start = process.hrtime.bigint();
+    const response = await predictionPool.request(
+      {
+        args: [parameters, path, tlineLength, infix, output, trainingFeature],
+        rows,
+        timings,
+      },
+      path
+    );
+    if (response.timings) {
+      response.timings.roundtrip_ms =
+        Number(process.hrtime.bigint() - start) / 1e6;
+    }
+    if (response.status !== "success") {
+      throw new Error(`Model error: ${response.message}`);
+    }
+    return response;
   };
 
   const generateToken = () => {
@@ -535,29 +674,32 @@ const pipeController = () => {
   };
 
   //Proxy functions can be added here if needed
-  const jmrProxy = (req, res) => {
+  const jmrProxy = async (req, res) => {
     const inputData = req.body;
     console.log("Received JMR proxy request with data:", inputData);
     const modelPath = "models/jmr_proxy_model.sav";
 
     try {
       // Validate input
+      // sensor_locations boleh diganti layout_id dari response sebelumnya (layout sudah terdaftar di worker)
       if (
-        !inputData.sensor_locations ||
+        (!inputData.sensor_locations && !inputData.layout_id) ||
         !inputData.normal_pressure ||
         !inputData.drop_pressure
       ) {
         return res.status(400).json({
           success: false,
           error:
-            "Missing required input fields: sensor_locations, normal_pressure, drop_pressure",
+            "Missing required input fields: sensor_locations (or layout_id), normal_pressure, drop_pressure",
         });
       }
 
+      const sensorCount = inputData.sensor_locations
+        ? inputData.sensor_locations.length
+        : inputData.normal_pressure.length;
       if (
-        inputData.sensor_locations.length !==
-          inputData.normal_pressure.length ||
-        inputData.sensor_locations.length !== inputData.drop_pressure.length
+        sensorCount !== inputData.normal_pressure.length ||
+        sensorCount !== inputData.drop_pressure.length
       ) {
         return res.status(400).json({
           success: false,
@@ -565,69 +707,29 @@ const pipeController = () => {
         });
       }
 
-      // Spawn Python process
-      const model = spawn("python3", ["models/jmr_proxy_model.py", modelPath]);
-
-      let stdout = "";
-      let stderr = "";
-
-      // Collect stdout data
-      model.stdout.on("data", (data) => {
-        const text = data.toString();
-        stdout += text;
-      });
-
-      // Collect stderr data
-      model.stderr.on("data", (data) => {
-        const text = data.toString();
-        stderr += text;
-        console.error(`Model stderr: ${text.trim()}`);
-      });
-
-      // Handle process close
-      model.on("close", (code) => {
-        if (code === 0) {
-          try {
-            const result = JSON.parse(stdout);
-
-            if (result.success) {
-              return res.status(200).json({
-                success: true,
-                result,
-              });
-            } else {
-              return res.status(500).json({
-                success: false,
-                error: result.error || "Model execution failed",
-              });
-            }
-          } catch (e) {
-            return res.status(500).json({
-              success: false,
-              error: `Failed to parse model output: ${e.message}`,
-              raw_output: stdout,
-            });
-          }
-        } else {
-          return res.status(500).json({
-            success: false,
-            error: `Model process exited with code ${code}`,
-            stderr: stderr,
-          });
+      // Dikirim ke worker jmr_proxy_model.py (micro-batch per layout sensor).
+      // layout_id / sensor_names memakai / mengisi layout yang tersimpan di proses worker,
+      // jadi request itu tidak boleh pindah ke worker lain.
+      const result = await jmrPool.request(
+        { model: modelPath, data: inputData },
+        modelPath,
+        {
+          strict:
+            inputData.layout_id !== undefined ||
+            inputData.sensor_names !== undefined,
         }
-      });
+      );
 
-      // Handle process error
-      model.on("error", (err) => {
-        return res.status(500).json({
-          success: false,
-          error: `Failed to start model process: ${err.message}`,
+      if (result.success) {
+        return res.status(200).json({
+          success: true,
+          result,
         });
+      }
+      return res.status(500).json({
+        success: false,
+        error: result.error || "Model execution failed",
       });
-
-      // Send input JSON to Python stdin
-      model.stdin.write(JSON.stringify(inputData));
-      model.stdin.end();
     } catch (err) {
       console.error("Unexpected error:", err);
       return res.status(500).json({
@@ -652,6 +754,8 @@ const pipeController = () => {
     uploadLineNode,
     validatePrediction,
     executePrediction,
+    executePredictionBatch,
+    compareModels,
     jmrProxy,
   };
 };
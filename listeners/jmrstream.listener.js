@@ -0,0 +1,83 @@
+import registry from "../utils/serviceregistry.utils.js";
+import emitter from "../utils/eventBus.js";
+import { jmrPool } from "../utils/predictionpool.utils.js";
+import { useSocketAuth } from "../middlewares/authverifier.socket.middleware.js";
+
+// Streaming estimasi kebocoran JMR per tick sensor (lihat LeakStream di jmr_proxy_model.py).
+// Worker hanya menjalankan ulang ensemble jika sensor teratas / estimasi / severity berubah,
+// dan hanya hasil seperti itu yang di-push ke subscriber.
+const MODEL_PATH = "models/jmr_proxy_model.sav";
+
+const nsp = registry.get("wsns:jmr");
+nsp.use(useSocketAuth);
+
+const room = (stream) => `stream:${stream}`;
+
+// State stream ada di satu proses worker, jadi afinitas strict (tidak pindah worker)
+const streamRequest = (payload) =>
+  jmrPool.request({ model: MODEL_PATH, ...payload }, MODEL_PATH, {
+    strict: true,
+  });
+
+const publish = (response) => {
+  if (response.success && response.updated) {
+    nsp.to(room(response.stream)).emit("jmr:estimate", response);
+  }
+  return response;
+};
+
+const openStream = async (stream, data) =>
+  publish(await streamRequest({ op: "stream_open", stream, data }));
+
+const tickStream = async (stream, ticks, force = false) =>
+  publish(await streamRequest({ op: "stream_tick", stream, ticks, force }));
+
+const closeStream = (stream) => streamRequest({ op: "stream_close", stream });
+
+// Handler socket: hasil dikirim lewat ack, error tidak memutus koneksi
+const withAck = (handler) => async (payload = {}, ack) => {
+  try {
+    const response = await handler(payload);
+    if (typeof ack === "function") ack(response);
+  } catch (err) {
+    if (typeof ack === "function") ack({ success: false, error: err.message });
+  }
+};
+
+nsp.on("connection", (socket) => {
+  socket.on(
+    "jmr:subscribe",
+    withAck(async ({ stream }) => {
+      socket.join(room(stream));
+      return { success: true, stream };
+    })
+  );
+  socket.on(
+    "jmr:unsubscribe",
+    withAck(async ({ stream }) => {
+      socket.leave(room(stream));
+      return { success: true, stream };
+    })
+  );
+  socket.on(
+    "jmr:open",
+    withAck(({ stream, data }) => openStream(stream, data))
+  );
+  socket.on(
+    "jmr:tick",
+    withAck(({ stream, ticks, force }) => tickStream(stream, ticks, force))
+  );
+  socket.on(
+    "jmr:close",
+    withAck(({ stream }) => closeStream(stream))
+  );
+});
+
+// Sumber data di server (mis. ingest tekanan per spot) bisa mengirim tick lewat event bus
+emitter.on("jmr:tick", ({ stream, ticks, force }) => {
+  tickStream(stream, ticks, force).catch((err) =>
+    logger.error(`JMR stream ${stream}: ${err.message}`)
+  );
+});
+
+export { openStream, tickStream, closeStream };
@@ -0,0 +1,109 @@
+"""
+=================================================================================
+ROLLING PRESSURE BASELINES
+=================================================================================
+
+Per-spot ring buffers of recent psi readings, held in one fixed-size
+(spots x window) numpy array. Each reading updates its spot in place:
+the EWMA baseline in O(1), the rolling median for that spot only
+(np.median over its window, no other spot is touched). The baseline is
+read *before* the new reading is stored, so the drop of a tick is measured
+against history and a sudden leak does not pull its own baseline down.
+
+baselines() / current / drops() give the normal_pressure, drop_pressure and
+delta vectors the models take, without re-aggregating day-long series.
+=================================================================================
+"""
+
+import numpy as np
+
+# Readings kept per spot (e.g. one hour of 5 s ticks)
+DEFAULT_WINDOW = 720
+DEFAULT_ALPHA = 0.05
+BASELINE_METHODS = ('median', 'ewma')
+
+
+class BaselineEngine:
+    """Rolling median / EWMA baseline and latest reading for a fixed set of spots"""
+
+    def __init__(self, n_spots, window=DEFAULT_WINDOW, method='median', alpha=DEFAULT_ALPHA,
+                 min_samples=1):
+        if method not in BASELINE_METHODS:
+            raise ValueError(f"Unknown baseline method: {method} (use {', '.join(BASELINE_METHODS)})")
+        if int(window) < 1 or not 0 < float(alpha) <= 1:
+            raise ValueError('Baseline window must be >= 1 and alpha in (0, 1]')
+
+        self.method = method
+        self.window = int(window)
+        self.alpha = float(alpha)
+        self.min_samples = max(1, int(min_samples))
+
+        # Filled slots are always values[spot, :count[spot]]; head is the next write slot
+        self.values = np.full((n_spots, self.window), np.nan)
+        self.head = np.zeros(n_spots, dtype=np.intp)
+        self.count = np.zeros(n_spots, dtype=np.intp)
+        self.ewma = np.full(n_spots, np.nan)
+        self.median = np.full(n_spots, np.nan)
+        self.current = np.full(n_spots, np.nan)
+
+    @property
+    def n_spots(self):
+        return len(self.current)
+
+    def baseline(self, spot):
+        """Baseline of one spot (NaN until min_samples readings are in)"""
+        if self.count[spot] < self.min_samples:
+            return np.nan
+        return self.median[spot] if self.method == 'median' else self.ewma[spot]
+
+    def baselines(self):
+        """Baseline vector for all spots"""
+        values = self.median if self.method == 'median' else self.ewma
+        return np.where(self.count >= self.min_samples, values, np.nan)
+
+    def drops(self):
+        """Baseline minus latest reading per spot"""
+        return self.baselines() - self.current
+
+    def update(self, spot, psi):
+        """Store one reading; returns (baseline before this reading, reading)"""
+        psi = float(psi)
+        baseline = self.baseline(spot)
+
+        head = self.head[spot]
+        self.values[spot, head] = psi
+        self.head[spot] = (head + 1) % self.window
+        if self.count[spot] < self.window:
+            self.count[spot] += 1
+
+        previous = self.ewma[spot]
+        self.ewma[spot] = psi if np.isnan(previous) else self.alpha * psi + (1 - self.alpha) * previous
+        if self.method == 'median':
+            self.median[spot] = np.median(self.values[spot, :self.count[spot]])
+        self.current[spot] = psi
+        return baseline, psi
+
+    def extend(self, spot, readings):
+        """Warm one spot up from history (oldest first); only the last window readings are kept"""
+        readings = np.asarray(readings, dtype=float)
+        if readings.size == 0:
+            return
+        kept = readings[-self.window:]
+
+        # Rebuild the ring in order: existing readings (oldest first) followed by the new ones
+        if self.count[spot] == self.window:
+            existing = np.roll(self.values[spot], -self.head[spot])
+        else:
+            existing = self.values[spot, :self.count[spot]]
+        merged = np.concatenate([existing, kept])[-self.window:]
+        self.values[spot, :len(merged)] = merged
+        self.count[spot] = len(merged)
+        self.head[spot] = len(merged) % self.window
+
+        # EWMA continues over the kept readings (older ones would carry weight (1 - alpha) ** window at most)
+        ewma = self.ewma[spot]
+        for psi in kept.tolist():
+            ewma = psi if np.isnan(ewma) else self.alpha * psi + (1 - self.alpha) * ewma
+        self.ewma[spot] = ewma
+        self.median[spot] = np.median(merged)
+        self.current[spot] = kept[-1]
@@ -0,0 +1,260 @@
+"""
+Scoring streaming untuk back-test model terhadap histori tekanan (ekspor psi per spot).
+
+Usage: python3 models/batch_score.py <parameterLength> <modelName> <tline_length> <infix> <output_type> [training_infix]
+           [--input file] [--format ndjson|csv] [--chunk-size N] [--workers N]
+       python3 models/batch_score.py --jmr <model_path> [--input file] [--chunk-size N] [--workers N]
+
+Input dibaca per chunk (default 4096 baris) dari stdin atau --input: NDJSON (satu object
+atau array nilai per baris) atau CSV dengan header. Tiap chunk diprediksi dengan satu
+model.predict dan hasilnya langsung ditulis sebagai NDJSON, jadi memori tetap datar
+berapapun ukuran input. Kolom selain fitur (mis. timestamp, spot_id) ikut ditulis di "fields".
+Mode --jmr: tiap baris NDJSON adalah payload jmr_proxy_model.py (snapshot sensor).
+
+--workers N: chunk dibagi ke N proses (ProcessPoolExecutor). Tiap proses load model sekali
+(artifact .compiled di-mmap, jadi page memorinya berbagi), hasil ditulis sesuai urutan input.
+Ringkasan (jumlah baris, error, baris/detik) ditulis ke stderr di akhir.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+from json_output import dumps
+from prediction import (
+    PredictionError, print_error, debug_log, parse_arguments, feature_keys,
+    load_model, run_prediction_group
+)
+
+DEFAULT_CHUNK_SIZE = 4096
+# Chunk yang boleh menunggu per worker (membatasi memori saat output lebih lambat dari input)
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+def parse_cli(argv):
+    parser = argparse.ArgumentParser(description="Scoring streaming NDJSON/CSV dengan model prediksi")
+    parser.add_argument("spec", nargs="+", help="argumen sama dengan prediction.py (atau model path untuk --jmr)")
+    parser.add_argument("--jmr", action="store_true", help="scoring snapshot dengan jmr_proxy_model")
+    parser.add_argument("--input", default="-", help="file input, '-' = stdin")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default=None,
+                        help="format input (default dari ekstensi file, stdin = ndjson)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="jumlah proses scoring")
+    return parser.parse_args(argv)
+
+def open_input(path):
+    """Stream teks input (stdin jika '-')"""
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+def parse_ndjson(lines, input_keys, first_row=0):
+    """
+    Baris NDJSON -> dict; array nilai dipetakan ke input_keys (panjang harus sama),
+    baris rusak jadi PredictionError. first_row = nomor baris pertama untuk pesan error.
+    """
+    rows = []
+    for n, line in enumerate(lines):
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            rows.append(PredictionError(f"Format JSON tidak valid: {str(e)}"))
+            continue
+        if isinstance(row, list) and input_keys is not None:
+            if len(row) != len(input_keys):
+                row = PredictionError(
+                    f"Baris {first_row + n} berisi {len(row)} nilai, harus {len(input_keys)} nilai"
+                )
+            else:
+                row = dict(zip(input_keys, row))
+        elif not isinstance(row, dict):
+            row = PredictionError("Baris harus berupa object atau array")
+        rows.append(row)
+    return rows
+
+def parse_csv(records, header, input_keys):
+    """Record CSV -> dict; kolom fitur dikonversi ke float, nilai tidak valid dibiarkan untuk extract_inputs"""
+    rows = []
+    for record in records:
+        row = dict(zip(header, record))
+        for k in input_keys:
+            try:
+                row[k] = float(row[k])
+            except (KeyError, ValueError):
+                pass
+        rows.append(row)
+    return rows
+
+def score_chunk(model, rows, spec, input_keys, first_row):
+    """Prediksi satu chunk, return list output per baris (urutan sama dengan input)"""
+    valid = [row for row in rows if not isinstance(row, PredictionError)]
+    try:
+        results = iter(run_prediction_group(model, valid, spec)) if valid else iter(())
+    except PredictionError as e:
+        results = iter([{"status": "error", "message": str(e)}] * len(valid))
+
+    outputs = []
+    for n, row in enumerate(rows):
+        if isinstance(row, PredictionError):
+            output = {"status": "error", "message": str(row)}
+        else:
+            output = dict(next(results))
+            output.pop("model", None)
+            fields = {k: v for k, v in row.items() if k not in input_keys}
+            if fields:
+                output["fields"] = fields
+        output["row"] = first_row + n
+        outputs.append(output)
+    return outputs
+
+def score_jmr_chunk(model, metadata, rows, first_row):
+    """Scoring satu chunk snapshot jmr (layout sensor sama digabung ke predict_batch)"""
+    from jmr_proxy_model import score_snapshots
+
+    valid = [row for row in rows if not isinstance(row, PredictionError)]
+    results = iter(score_snapshots(model, metadata, valid))
+    outputs = []
+    for n, row in enumerate(rows):
+        if isinstance(row, PredictionError):
+            output = {"success": False, "error": str(row)}
+        else:
+            output = next(results)
+        output["row"] = first_row + n
+        outputs.append(output)
+    return outputs
+
+# State scorer per proses, diisi init_scorer (di proses utama atau tiap worker pool)
+_scorer = None
+
+def build_scorer(config):
+    """Load model sekali dan return fungsi (chunk mentah, nomor baris pertama) -> list output"""
+    fmt, header = config["format"], config["header"]
+
+    if config["jmr"]:
+        from jmr_proxy_model import load_model as load_jmr_model
+        model, metadata, error = load_jmr_model(config["spec"][0])
+        if error:
+            raise PredictionError(error)
+        return lambda raw, first_row: score_jmr_chunk(model, metadata, parse_ndjson(raw, None, first_row), first_row)
+
+    spec = parse_arguments(config["spec"])
+    parameterLength, model_path, tline_length, infix, output_type, training_infix = spec
+    input_keys, _ = feature_keys(parameterLength, infix, training_infix)
+    model = load_model(model_path)
+
+    def score(raw, first_row):
+        rows = parse_csv(raw, header, input_keys) if fmt == "csv" else parse_ndjson(raw, input_keys, first_row)
+        return score_chunk(model, rows, spec, input_keys, first_row)
+    return score
+
+def init_scorer(config):
+    global _scorer
+    _scorer = build_scorer(config)
+
+def process_chunk(raw, first_row):
+    """Scoring satu chunk mentah di proses ini, return (teks NDJSON, jumlah baris, jumlah error)"""
+    outputs = _scorer(raw, first_row)
+    errors = sum(output.get("status") == "error" or output.get("success") is False for output in outputs)
+    return "".join(dumps(output) + "\n" for output in outputs), len(outputs), errors
+
+def read_chunks(stream, fmt, chunk_size):
+    """Chunk mentah dari input: list baris NDJSON, atau list record CSV (header dibaca terpisah)"""
+    if fmt == "csv":
+        reader = csv.reader(stream)
+        header = next(reader, [])
+        source = reader
+    else:
+        header = None
+        source = (line for line in stream if line.strip())
+
+    def chunks():
+        while True:
+            chunk = list(islice(source, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+    return header, chunks()
+
+def score_serial(chunks):
+    """Scoring semua chunk di proses ini"""
+    first_row = 0
+    for raw in chunks:
+        result = process_chunk(raw, first_row)
+        first_row += len(raw)
+        yield result
+
+def score_parallel(chunks, config, workers):
+    """Scoring chunk di ProcessPoolExecutor, hasil di-yield sesuai urutan input"""
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_scorer, initargs=(config,)) as pool:
+        pending = deque()
+        first_row = 0
+        for raw in chunks:
+            pending.append(pool.submit(process_chunk, raw, first_row))
+            first_row += len(raw)
+            if len(pending) >= workers * CHUNKS_IN_FLIGHT_PER_WORKER:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def main():
+    options = parse_cli(sys.argv[1:])
+    try:
+        if options.chunk_size < 1:
+            raise PredictionError("--chunk-size minimal 1")
+        if options.workers < 1:
+            raise PredictionError("--workers minimal 1")
+        fmt = options.format or ("csv" if options.input.lower().endswith(".csv") else "ndjson")
+        if options.jmr and fmt == "csv":
+            raise PredictionError("Mode --jmr hanya menerima input NDJSON")
+        try:
+            stream = open_input(options.input)
+        except OSError as e:
+            raise PredictionError(f"Gagal buka input: {str(e)}")
+
+        header, chunks = read_chunks(stream, fmt, options.chunk_size)
+        config = {"jmr": options.jmr, "spec": options.spec, "format": fmt, "header": header}
+        # Model di-load di proses utama juga, supaya error model/argumen dilaporkan sebelum worker dibuat
+        init_scorer(config)
+    except PredictionError as e:
+        print_error(str(e))
+
+    total = errors = n_chunks = 0
+    start = time.perf_counter()
+    with stream:
+        if options.workers > 1:
+            results = score_parallel(chunks, config, options.workers)
+        else:
+            results = score_serial(chunks)
+        for text, n_rows, n_errors in results:
+            sys.stdout.write(text)
+            total += n_rows
+            errors += n_errors
+            n_chunks += 1
+    sys.stdout.flush()
+
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        "batch_score": {
+            "rows": total,
+            "errors": errors,
+            "chunks": n_chunks,
+            "workers": options.workers,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(total / elapsed, 1) if elapsed > 0 else None
+        }
+    }), file=sys.stderr)
+
+if __name__ == "__main__":
+    try:
+        main()
+    except BrokenPipeError:
+        # Output dipotong (mis. | head), bukan error scoring
+        sys.stderr.close()
+    except Exception as e:
+        debug_log(f"Fatal error: {str(e)}")
+        print_error(f"Terjadi kesalahan fatal: {str(e)}")
@@ -0,0 +1,330 @@
+"""
+Benchmark prediction.py (model Single, Multi, RF) dan jmr_proxy_model.py dengan input sintetis.
+
+Usage: python3 models/benchmark.py [--quick] [--output hasil.json]
+           [--baseline baseline.json [--tolerance 0.2]] [--save-baseline baseline.json]
+
+Per target diukur:
+- cold start: satu proses one-shot per run (termasuk start interpreter), median wall time + peak RSS
+- warm: satu proses --worker, request dikirim satu per satu per ukuran batch;
+  latency per call (p50/p90/p99), baris/detik dan peak RSS (VmHWM) worker
+Ukuran batch 1 dikirim sebagai request single ("data"), selebihnya sebagai batch
+("rows" / drop_pressure 2D). Target jmr diulang untuk beberapa jumlah sensor.
+
+--baseline: bandingkan dengan hasil yang disimpan sebelumnya (--save-baseline);
+exit code 1 jika ada metrik yang lebih buruk dari toleransi (default 20%).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# (nama, file model, parameterLength, tline_length, infix, output_type, training_infix)
+PREDICTION_TARGETS = (
+    ("single", "BJG_TPN_Single_1759896430701.sav", 4, 50, "P{x}", "single", "P{x}"),
+    ("multi", "RTU_Multi_1759981639669.sav", 9, 50, "P{x}", "multiple", "Titik_{x}_PSI"),
+    ("rf", "KAS_RF_1759932189965.sav", 4, 50, "P{x}", "single", "P{x}"),
+)
+JMR_MODEL = "models/jmr_proxy_model.sav"
+JMR_PIPELINE_LENGTH = 110
+
+BATCH_SIZES = (1, 16, 256, 4096)
+JMR_SENSOR_COUNTS = (9, 32, 128)
+JMR_BATCH_SIZES = (1, 64, 1024)
+QUICK_BATCH_SIZES = (1, 64)
+QUICK_SENSOR_COUNTS = (9,)
+
+# Metrik yang dibandingkan dengan baseline: True = makin besar makin baik
+COMPARED_METRICS = {
+    "cold_ms": False,
+    "cold_peak_rss_kb": False,
+    "p50_ms": False,
+    "p99_ms": False,
+    "rows_per_s": True,
+    "peak_rss_kb": False
+}
+
+SEED = 1234
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+# =============================================================================
+# Input sintetis
+# =============================================================================
+
+def prediction_rows(rng, n_features, size):
+    """Delta tekanan acak (psi), satu baris per prediksi"""
+    return np.round(rng.uniform(-5, 25, size=(size, n_features)), 2).tolist()
+
+def jmr_snapshot(rng, n_sensors, size):
+    """Layout sensor merata sepanjang pipa, tekanan turun ke hilir, drop acak per skenario"""
+    locations = np.round(np.linspace(2, JMR_PIPELINE_LENGTH - 2, n_sensors), 3)
+    normal = np.round(np.linspace(215, 35, n_sensors), 2)
+    drop = np.round(normal - rng.uniform(0.5, 8, size=(size, n_sensors)), 2)
+    return {
+        "sensor_locations": locations.tolist(),
+        "normal_pressure": normal.tolist(),
+        "drop_pressure": drop[0].tolist() if size == 1 else drop.tolist(),
+        "verbose": False
+    }
+
+# =============================================================================
+# Pengukuran
+# =============================================================================
+
+def worker_env():
+    env = dict(os.environ)
+    env.setdefault("PREDICTION_LOG_LEVEL", "0")
+    env.setdefault("PYTHONWARNINGS", "ignore")
+    # Payload warm diulang persis sama; tanpa ini yang terukur hit result_cache, bukan prediksi
+    env["RESULT_CACHE_TTL"] = "0"
+    return env
+
+def is_error(response):
+    return response.get("status") == "error" or response.get("success") is False
+
+def run_cold(cmd, stdin_data):
+    """Satu proses one-shot, return (wall_ms, peak RSS KB, sukses)"""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL, env=worker_env())
+    proc.stdin.write(stdin_data.encode())
+    proc.stdin.close()
+    out = proc.stdout.read()
+    proc.stdout.close()
+    # wait4 memberi rusage proses itu sendiri (ru_maxrss dalam KB di Linux)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall_ms = (time.perf_counter() - start) * 1000
+    try:
+        ok = proc.returncode == 0 and not is_error(json.loads(out))
+    except ValueError:
+        ok = False
+    return wall_ms, usage.ru_maxrss, ok
+
+def measure_cold(cmd, stdin_data, runs):
+    walls, peaks, ok = [], [], True
+    for _ in range(runs):
+        wall_ms, peak_rss_kb, success = run_cold(cmd, stdin_data)
+        walls.append(wall_ms)
+        peaks.append(peak_rss_kb)
+        ok = ok and success
+    return {"cold_ms": round(statistics.median(walls), 1), "cold_peak_rss_kb": max(peaks),
+            "cold_runs": runs, "ok": ok}
+
+class WorkerClient:
+    """Proses --worker yang dikirimi request NDJSON satu per satu"""
+
+    def __init__(self, cmd):
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL, env=worker_env())
+        self.next_id = 1
+
+    def call(self, payload):
+        payload = dict(payload, id=self.next_id)
+        self.next_id += 1
+        self.proc.stdin.write((json.dumps(payload) + "\n").encode())
+        self.proc.stdin.flush()
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError("Worker berhenti sebelum menjawab")
+        return json.loads(line)
+
+    def peak_rss_kb(self):
+        """VmHWM proses worker (Linux), None jika tidak tersedia"""
+        try:
+            with open(f"/proc/{self.proc.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1])
+        except OSError:
+            return None
+        return None
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait()
+
+def measure_warm(client, payload, size, calls, warmup):
+    """Latency per call untuk satu payload yang sama, return dict metrik"""
+    errors = 0
+    for _ in range(warmup):
+        errors += is_error(client.call(payload))
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        response = client.call(payload)
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors += is_error(response)
+    total_s = sum(latencies) / 1000
+    return {
+        "batch_size": size,
+        "calls": calls,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "rows_per_s": round(size * calls / total_s, 1) if total_s > 0 else None,
+        "errors": errors
+    }
+
+def calls_for(size, calls):
+    """Batch besar dikirim lebih sedikit kali supaya durasi per ukuran seimbang"""
+    return max(5, min(calls, calls * 64 // max(size, 1)))
+
+def bench_prediction(target, options, rng):
+    name, model_file, n_features, tline_length, infix, output_type, training_infix = target
+    args = [str(n_features), model_file, str(tline_length), infix, output_type, training_infix]
+    script = "models/prediction.py"
+
+    sample = dict(zip([infix.replace("{x}", str(i)) for i in range(1, n_features + 1)],
+                      prediction_rows(rng, n_features, 1)[0]))
+    result = {
+        "model": model_file,
+        **measure_cold([sys.executable, script, *args], json.dumps(sample), options.cold_runs),
+        "warm": []
+    }
+
+    client = WorkerClient([sys.executable, script, "--worker"])
+    try:
+        for size in options.batch_sizes:
+            if size == 1:
+                payload = {"args": args, "data": sample}
+            else:
+                payload = {"args": args, "rows": prediction_rows(rng, n_features, size)}
+            result["warm"].append(measure_warm(client, payload, size, calls_for(size, options.calls), options.warmup))
+        result["peak_rss_kb"] = client.peak_rss_kb()
+    finally:
+        client.close()
+    return name, result
+
+def bench_jmr(n_sensors, options, rng):
+    script = "models/jmr_proxy_model.py"
+    result = {
+        "model": os.path.basename(JMR_MODEL),
+        "sensors": n_sensors,
+        **measure_cold([sys.executable, script, JMR_MODEL], json.dumps(jmr_snapshot(rng, n_sensors, 1)),
+                       options.cold_runs),
+        "warm": []
+    }
+
+    client = WorkerClient([sys.executable, script, "--worker"])
+    try:
+        for size in options.jmr_batch_sizes:
+            payload = {"model": JMR_MODEL, "data": jmr_snapshot(rng, n_sensors, size)}
+            result["warm"].append(measure_warm(client, payload, size, calls_for(size, options.calls), options.warmup))
+        result["peak_rss_kb"] = client.peak_rss_kb()
+    finally:
+        client.close()
+    return f"jmr_{n_sensors}", result
+
+# =============================================================================
+# Baseline
+# =============================================================================
+
+def flat_metrics(results):
+    """{target: hasil} -> {"target.metrik" / "target.bN.metrik": nilai} untuk dibandingkan"""
+    flat = {}
+    for name, result in results.items():
+        for metric in ("cold_ms", "cold_peak_rss_kb", "peak_rss_kb"):
+            if result.get(metric) is not None:
+                flat[f"{name}.{metric}"] = result[metric]
+        for warm in result["warm"]:
+            for metric in ("p50_ms", "p99_ms", "rows_per_s"):
+                if warm.get(metric) is not None:
+                    flat[f"{name}.b{warm['batch_size']}.{metric}"] = warm[metric]
+    return flat
+
+def compare(results, baseline, tolerance):
+    """Daftar metrik yang lebih buruk dari baseline melebihi toleransi (relatif)"""
+    current, previous = flat_metrics(results), flat_metrics(baseline["results"])
+    regressions = []
+    for key, value in current.items():
+        before = previous.get(key)
+        if not before:
+            continue
+        higher_is_better = COMPARED_METRICS[key.rsplit(".", 1)[1]]
+        change = (value - before) / before
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append({"metric": key, "baseline": before, "current": value,
+                                "change_pct": round(change * 100, 1)})
+    return regressions
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def parse_cli(argv):
+    parser = argparse.ArgumentParser(description="Benchmark prediction.py dan jmr_proxy_model.py")
+    parser.add_argument("--quick", action="store_true", help="ukuran batch dan jumlah sensor lebih sedikit")
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=50, help="call terukur per ukuran batch")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", help="tulis hasil JSON ke file (default stdout)")
+    parser.add_argument("--baseline", help="hasil benchmark sebelumnya untuk dibandingkan")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="regresi relatif yang masih diterima")
+    parser.add_argument("--save-baseline", help="simpan hasil ini sebagai baseline")
+    options = parser.parse_args(argv)
+    options.batch_sizes = QUICK_BATCH_SIZES if options.quick else BATCH_SIZES
+    options.jmr_batch_sizes = QUICK_BATCH_SIZES if options.quick else JMR_BATCH_SIZES
+    options.sensor_counts = QUICK_SENSOR_COUNTS if options.quick else JMR_SENSOR_COUNTS
+    if options.quick:
+        options.cold_runs = min(options.cold_runs, 3)
+    return options
+
+def main():
+    options = parse_cli(sys.argv[1:])
+    rng = np.random.default_rng(SEED)
+
+    results = {}
+    for target in PREDICTION_TARGETS:
+        name, result = bench_prediction(target, options, rng)
+        results[name] = result
+        print(f"{name}: cold {result['cold_ms']} ms", file=sys.stderr)
+    for n_sensors in options.sensor_counts:
+        name, result = bench_jmr(n_sensors, options, rng)
+        results[name] = result
+        print(f"{name}: cold {result['cold_ms']} ms", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "quick": options.quick
+        },
+        "results": results
+    }
+
+    regressions = []
+    if options.baseline:
+        with open(options.baseline) as f:
+            regressions = compare(results, json.load(f), options.tolerance)
+        report["comparison"] = {
+            "baseline": options.baseline,
+            "tolerance": options.tolerance,
+            "regressions": regressions
+        }
+
+    text = json.dumps(report, indent=2)
+    if options.output:
+        with open(options.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if options.save_baseline:
+        with open(options.save_baseline, "w") as f:
+            f.write(text + "\n")
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Regression check cold start prediction.py dan jmr_proxy_model.py.
+
+Usage: python3 models/check_startup.py [--runs N]
+Exit code 1 jika median wall time melewati budget, jika ada run yang gagal
+(exit code / output JSON tidak sesuai, mis. crash cepat saat startup), atau jika
+jalur error meng-import library berat (pandas/numpy/sklearn/scipy).
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Budget cold start (ms, median dari beberapa run, termasuk start interpreter)
+BUDGET_MS = {
+    "prediction_error_path": 300,
+    "prediction_cold": 3500,
+    "jmr_cold": 1500
+}
+
+HEAVY_MODULES = ("pandas", "numpy", "sklearn", "scipy")
+
+SAMPLE_MODEL = "KAS_RF_1759932189965.sav"
+SAMPLE_INPUT = {"P1": 1, "P2": 2, "P3": 3, "P4": 4}
+JMR_INPUT = {
+    "sensor_locations": [5, 18.2, 34.2, 45, 59, 65.5, 75, 86, 98],
+    "normal_pressure": [200, 190, 180, 170, 160, 150, 140, 130, 120],
+    "drop_pressure": [198, 187, 170, 160, 155, 146, 137, 128, 119]
+}
+
+def run(cmd, stdin_data=""):
+    """Jalankan satu proses cold, return (wall_ms, stdout, stderr, exit code)"""
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, input=stdin_data, capture_output=True, text=True)
+    return (time.perf_counter() - start) * 1000, proc.stdout, proc.stderr, proc.returncode
+
+def output_ok(stdout, returncode, expect_error):
+    """Output satu run sesuai harapan: JSON sukses + exit 0, atau (jalur error) JSON error terformat"""
+    try:
+        output = json.loads(stdout)
+    except ValueError:
+        return False
+    if not isinstance(output, dict):
+        return False
+    if expect_error:
+        return returncode != 0 and output.get("status") == "error"
+    return returncode == 0 and (output.get("success") is True or output.get("status") == "success")
+
+def median_wall(cmd, stdin_data, runs, expect_error=False):
+    """Return (median wall ms, jumlah run yang gagal)"""
+    walls, failed = [], 0
+    for _ in range(runs):
+        wall, stdout, _, returncode = run(cmd, stdin_data)
+        walls.append(wall)
+        if not output_ok(stdout, returncode, expect_error):
+            failed += 1
+    return statistics.median(walls), failed
+
+def heavy_imports_on_error_path():
+    """Modul berat yang ter-import saat argumen salah (harusnya kosong)"""
+    _, _, stderr, _ = run([sys.executable, "-X", "importtime", "models/prediction.py"])
+    imported = set()
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            imported.add(name.split(".")[0])
+    return sorted(imported.intersection(HEAVY_MODULES))
+
+def main():
+    runs = int(sys.argv[sys.argv.index("--runs") + 1]) if "--runs" in sys.argv else 5
+
+    measured = {
+        "prediction_error_path": median_wall(
+            [sys.executable, "models/prediction.py"], "", runs, expect_error=True),
+        "prediction_cold": median_wall(
+            [sys.executable, "models/prediction.py", "4", SAMPLE_MODEL, "50", "P{x}", "single"],
+            json.dumps(SAMPLE_INPUT), runs),
+        "jmr_cold": median_wall(
+            [sys.executable, "models/jmr_proxy_model.py", "models/jmr_proxy_model.sav"],
+            json.dumps(JMR_INPUT), runs)
+    }
+    results = {name: wall for name, (wall, _) in measured.items()}
+
+    failures = [
+        f"{name}: {failed}/{runs} run gagal (exit code / output tidak sesuai)"
+        for name, (_, failed) in measured.items() if failed
+    ]
+    failures += [
+        f"{name}: {results[name]:.0f} ms > budget {BUDGET_MS[name]} ms"
+        for name in BUDGET_MS if results[name] > BUDGET_MS[name]
+    ]
+    heavy = heavy_imports_on_error_path()
+    if heavy:
+        failures.append(f"jalur error meng-import: {', '.join(heavy)}")
+
+    print(json.dumps({
+        "median_ms": {k: round(v, 1) for k, v in results.items()},
+        "budget_ms": BUDGET_MS,
+        "failures": failures
+    }, indent=2))
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
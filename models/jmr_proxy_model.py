@@ -4,7 +4,17 @@ PIPELINE LEAK DETECTION - API MODE
 =================================================================================
 
 Execution via Node.js spawn with JSON input/output
-Usage: python3 models/jmr_proxy_model.py <model_path>
+Usage: python3 models/jmr_proxy_model.py <model_path> [--pretty] [--startup-profile]
+       python3 models/jmr_proxy_model.py --compile <model_path>
+       python3 models/jmr_proxy_model.py --worker   (NDJSON requests, see handle_worker_lines)
+
+Output is single-line JSON by default (orjson is used when installed).
+Set "verbose": false in the input to omit the per-sensor arrays.
+Set "localize": true (or {"resolution", "source", "profile"}) to add a
+location estimate searched on a dense KP grid (see LeakDetectionModel.localize).
+Responses carry sensors.layout_id; later requests to the same process
+(--worker) may send "layout_id" instead of sensor_locations/sensor_names.
+--worker also serves stateful streams for live ticks (stream_open / stream_tick).
 
 Author: Pertamina EP Jambi Field - Team UWAK PO
 Version: 4.1 - API Mode
@@ -12,13 +22,195 @@ Date: 2025-11-18
 =================================================================================
 """
 
+import time
+SCRIPT_START = time.perf_counter()
+
 import pickle
+import hashlib
 import numpy as np
-import pandas as pd
 import json
 import sys
+from collections import OrderedDict
 from datetime import datetime
-from scipy import interpolate
+from model_cache import model_cache, file_signature
+from result_cache import result_cache
+from model_artifact import save_artifact, load_artifact
+from json_output import dumps, pop_flag
+from startup_profile import StartupProfile
+
+# scipy.interpolate is imported inside train(); unpickling a trained model
+# pulls it in on its own, so the API path never imports it explicitly.
+
+# Per-sensor arrays dropped from the prediction when the caller sets "verbose": false
+VERBOSE_FIELDS = ('suspicion_index', 'pressure_changes', 'pressure_ratios')
+
+# =============================================================================
+# BATCH RESULT LABELS
+# =============================================================================
+
+# predict_batch() returns class codes; these arrays map codes to labels
+METHOD_ORDER = ('suspicion_index', 'midpoint', 'gradient', 'max_drop', 'weighted_avg')
+CONFIDENCE_LABELS = np.array(["VERY HIGH", "HIGH", "MODERATE", "LOW"])
+SEVERITY_LABELS = np.array(["LOW", "MODERATE", "HIGH", "CRITICAL"])
+ACTION_LABELS = np.array([
+    "CONTINUE MONITORING", "SCHEDULE INSPECTION",
+    "URGENT INSPECTION REQUIRED", "IMMEDIATE SHUTDOWN & INSPECTION"
+])
+PRIORITY_LABELS = np.array(["LOW", "MEDIUM", "HIGH", "CRITICAL"])
+
+# =============================================================================
+# SENSOR LAYOUT
+# =============================================================================
+
+# Layouts kept per model instance (least recently used dropped first)
+MAX_LAYOUTS = 64
+
+# Dense KP grid for localize(), in pipeline_length units (0.01 km = 10 m)
+GRID_RESOLUTION = 0.01
+# Finest grid a request may ask for (1 m)
+MIN_GRID_RESOLUTION = 0.001
+MAX_GRID_POINTS = 1_000_001
+# Memory budgets: one basis (points x sensors float64), all cached bases together,
+# and the curves of one localize() call (curves x scenarios x points float64)
+GRID_BASIS_MAX_BYTES = 64 * 1024 * 1024
+GRID_CACHE_MAX_BYTES = 256 * 1024 * 1024
+LOCALIZE_MAX_BYTES = 128 * 1024 * 1024
+# Trained-curve grids kept per model (one per resolution)
+MAX_TRAINED_GRIDS = 4
+LOCALIZE_SOURCES = ('live', 'trained')
+# Curves combined by localize(), with their method_weights key
+GRID_CURVES = ('suspicion_index', 'gradient', 'pressure_drop')
+
+
+def layout_hash(sensor_locations, sensor_names=None):
+    """Stable id for a sensor layout (hash of the float64 locations and the names, if any)"""
+    locations = np.ascontiguousarray(sensor_locations, dtype=float)
+    digest = hashlib.sha1(locations.tobytes())
+    if sensor_names is not None:
+        digest.update(json.dumps(list(sensor_names)).encode())
+    return digest.hexdigest()[:16]
+
+
+class GridCache:
+    """Dense grid bases shared by all layouts, least recently used dropped first past max_bytes"""
+    
+    def __init__(self, max_bytes=GRID_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+    
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+    
+    def put(self, key, value, nbytes):
+        self._entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, dropped) = self._entries.popitem(last=False)
+            self.nbytes -= dropped
+
+
+# Keyed by (geometry_id, pipeline_length, resolution): the basis depends only on those
+_grid_cache = GridCache()
+
+
+def check_resolution(resolution):
+    """Validated grid resolution; rejects values finer than MIN_GRID_RESOLUTION (and NaN)"""
+    resolution = float(resolution)
+    if not resolution >= MIN_GRID_RESOLUTION:
+        raise ValueError(f'Grid resolution must be >= {MIN_GRID_RESOLUTION}')
+    return resolution
+
+
+class SensorLayout:
+    """
+    Layout-only quantities for one sensor_locations array, computed once:
+    spacing, midpoints with the upstream neighbour and the np.gradient
+    coefficients. Callers can then send only the pressure vectors.
+    Layouts are shared between callers and never change after construction:
+    the same locations with other names are a separate layout (own layout_id).
+    """
+    
+    def __init__(self, sensor_locations, sensor_names=None):
+        self.locations = np.array(sensor_locations, dtype=float)
+        self.locations.flags.writeable = False
+        self.sensor_names = None if sensor_names is None else tuple(sensor_names)
+        self.layout_id = layout_hash(self.locations, self.sensor_names)
+        # Named and unnamed layouts of the same locations share grid bases
+        self.geometry_id = layout_hash(self.locations)
+        n = len(self.locations)
+        
+        # Midpoint with the upstream neighbour (undefined for the first sensor)
+        self.midpoints = np.full(n, np.nan)
+        self.midpoints[1:] = (self.locations[1:] + self.locations[:-1]) / 2
+        
+        # Second-order central differences, same formulas as np.gradient
+        self.spacing = np.diff(self.locations)
+        self.uniform_spacing = n < 2 or bool((self.spacing == self.spacing[0]).all())
+        if n >= 3:
+            dx1, dx2 = self.spacing[:-1], self.spacing[1:]
+            self.grad_a = -dx2 / (dx1 * (dx1 + dx2))
+            self.grad_b = (dx2 - dx1) / (dx1 * dx2)
+            self.grad_c = dx1 / (dx2 * (dx1 + dx2))
+    
+    def grid_basis(self, pipeline_length, resolution=GRID_RESOLUTION):
+        """
+        Dense KP grid over [0, pipeline_length] and the (grid, sensors) matrix
+        that interpolates per-sensor values onto it: basis @ values equals
+        interp1d(locations, values, kind='cubic')(grid) as fitted in train()
+        (quadratic / linear for 3 / 2 sensors). Beyond the outer sensors the
+        end values are held instead of extrapolated. Returns (grid, basis, inside)
+        with inside marking the grid points within the sensor span.
+        Raises ValueError when the basis would exceed GRID_BASIS_MAX_BYTES.
+        """
+        resolution = check_resolution(resolution)
+        key = (self.geometry_id, float(pipeline_length), resolution)
+        cached = _grid_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        n = len(self.locations)
+        if n < 2:
+            raise ValueError('Localization needs at least 2 sensors')
+        points = int(round(pipeline_length / resolution)) + 1
+        if points > MAX_GRID_POINTS:
+            raise ValueError(f'Grid too fine: {points} points (max {MAX_GRID_POINTS})')
+        nbytes = points * n * 8
+        if nbytes > GRID_BASIS_MAX_BYTES:
+            raise ValueError(f'Grid too fine for {n} sensors: {points} points x {n} sensors '
+                             f'({nbytes // 2**20} MB, max {GRID_BASIS_MAX_BYTES // 2**20} MB)')
+        
+        from scipy import interpolate
+        
+        kind = 'cubic' if n >= 4 else ('quadratic' if n == 3 else 'linear')
+        start, end = self.locations.min(), self.locations.max()
+        grid = np.linspace(0, pipeline_length, points)
+        # Interpolating the identity gives each sensor's cardinal function on the grid
+        basis = interpolate.interp1d(self.locations, np.eye(n), kind=kind, axis=0)(np.clip(grid, start, end))
+        inside = (grid >= start) & (grid <= end)
+        if not inside.any():
+            raise ValueError('Sensor locations lie outside the pipeline')
+        
+        _grid_cache.put(key, (grid, basis, inside), basis.nbytes + grid.nbytes + inside.nbytes)
+        return grid, basis, inside
+    
+    def gradient(self, values):
+        """np.gradient(values, locations) along the last axis (needs at least 3 sensors)"""
+        f = np.asarray(values, dtype=float)
+        out = np.empty(f.shape)
+        if self.uniform_spacing:
+            dx = self.spacing[0]
+            out[..., 1:-1] = (f[..., 2:] - f[..., :-2]) / (2. * dx)
+        else:
+            out[..., 1:-1] = self.grad_a * f[..., :-2] + self.grad_b * f[..., 1:-1] + self.grad_c * f[..., 2:]
+        out[..., 0] = (f[..., 1] - f[..., 0]) / self.spacing[0]
+        out[..., -1] = (f[..., -1] - f[..., -2]) / self.spacing[-1]
+        return out
+
 
 # =============================================================================
 # LEAK DETECTION MODEL CLASS
@@ -50,6 +242,8 @@ class LeakDetectionModel:
     
     def train(self, sensor_locations, normal_pressure, drop_pressure):
         """Train model with sensor data"""
+        from scipy import interpolate
+        
         pressure_changes = normal_pressure - drop_pressure
         pressure_ratios = drop_pressure / normal_pressure
         
@@ -91,51 +285,99 @@ class LeakDetectionModel:
         return self
     
     def _calculate_suspicion_index(self, locations, changes, ratios):
-        """Calculate suspicion index for each sensor"""
+        """Calculate suspicion index for each sensor (vectorized)"""
         n = len(locations)
-        suspicion = np.zeros(n)
-        
-        norm_changes = changes / np.max(changes) if np.max(changes) > 0 else changes
-        norm_ratios = (1 - ratios) / np.max(1 - ratios) if np.max(1 - ratios) > 0 else (1 - ratios)
-        
-        for i in range(n):
-            change_score = norm_changes[i]
-            ratio_score = norm_ratios[i]
-            
-            neighbor_score = 0
-            if i > 0:
-                neighbor_score += abs(changes[i] - changes[i-1])
-            if i < n-1:
-                neighbor_score += abs(changes[i] - changes[i+1])
-            neighbor_score = neighbor_score / np.max(changes) if np.max(changes) > 0 else 0
-            
-            suspicion[i] = 0.4 * change_score + 0.3 * ratio_score + 0.3 * neighbor_score
-        
-        return suspicion
-    
-    def predict(self, sensor_locations, normal_pressure, drop_pressure):
-        """Predict leak location from current sensor readings"""
+        max_change = np.max(changes)
+        drop_ratios = 1 - ratios
+        max_drop_ratio = np.max(drop_ratios)
+        
+        norm_changes = changes / max_change if max_change > 0 else changes
+        norm_ratios = drop_ratios / max_drop_ratio if max_drop_ratio > 0 else drop_ratios
+        
+        # |change[i] - change[i-1]| + |change[i] - change[i+1]|, missing neighbours count as 0
+        neighbor_diffs = np.abs(np.diff(changes))
+        neighbor_score = np.zeros(n)
+        neighbor_score[1:] += neighbor_diffs
+        neighbor_score[:-1] += neighbor_diffs
+        if max_change > 0:
+            neighbor_score = neighbor_score / max_change
+        else:
+            neighbor_score = np.zeros(n)
+        
+        return 0.4 * norm_changes + 0.3 * norm_ratios + 0.3 * neighbor_score
+    
+    def _sensor_state(self, sensor_locations, normal_pressure, drop_pressure):
+        """
+        Pressure changes, ratios and suspicion scores for one snapshot.
+        The last result is kept so predict() and get_sensor_analysis() on the
+        same snapshot compute it only once.
+        """
+        key = (
+            sensor_locations.tobytes(), normal_pressure.tobytes(), drop_pressure.tobytes(),
+            sensor_locations.dtype.str, normal_pressure.dtype.str, drop_pressure.dtype.str
+        )
+        cached = getattr(self, '_last_sensor_state', None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
         pressure_changes = normal_pressure - drop_pressure
         pressure_ratios = drop_pressure / normal_pressure
-        
         suspicion_scores = self._calculate_suspicion_index(
             sensor_locations, pressure_changes, pressure_ratios
         )
+        state = (pressure_changes, pressure_ratios, suspicion_scores)
+        self._last_sensor_state = (key, state)
+        return state
+    
+    def layout_for(self, sensor_locations, sensor_names=None):
+        """
+        SensorLayout for these locations (and sensor_names, when given),
+        registered under its hash on first use. Names are part of the layout,
+        so later calls that send only its layout_id get the same names back.
+        """
+        layouts = getattr(self, '_layouts', None)
+        if layouts is None:
+            layouts = self._layouts = OrderedDict()
+        
+        layout_id = layout_hash(sensor_locations, sensor_names)
+        layout = layouts.get(layout_id)
+        if layout is None:
+            layout = layouts[layout_id] = SensorLayout(sensor_locations, sensor_names)
+            if len(layouts) > MAX_LAYOUTS:
+                layouts.popitem(last=False)
+        else:
+            layouts.move_to_end(layout_id)
+        return layout
+    
+    def get_layout(self, layout_id):
+        """Registered SensorLayout by id, or None"""
+        layouts = getattr(self, '_layouts', None) or {}
+        layout = layouts.get(layout_id)
+        if layout is not None:
+            layouts.move_to_end(layout_id)
+        return layout
+    
+    def predict(self, sensor_locations, normal_pressure, drop_pressure, state=None):
+        """
+        Predict leak location from current sensor readings. state is an optional
+        precomputed (changes, ratios, scores) tuple, e.g. from LeakStream.
+        """
+        pressure_changes, pressure_ratios, suspicion_scores = state or self._sensor_state(
+            sensor_locations, normal_pressure, drop_pressure
+        )
         
+        layout = self.layout_for(sensor_locations)
         top_sensor_idx = np.argmax(suspicion_scores)
         
         # METHOD 1: Suspicion Index Peak
         estimate_suspicion = sensor_locations[top_sensor_idx] - self.upstream_bias
         
-        # METHOD 2: Midpoint between sensors
-        estimate_midpoint = np.nan
-        if top_sensor_idx > 0:
-            estimate_midpoint = (sensor_locations[top_sensor_idx] + 
-                                sensor_locations[top_sensor_idx-1]) / 2
+        # METHOD 2: Midpoint between sensors (NaN for the first sensor)
+        estimate_midpoint = layout.midpoints[top_sensor_idx]
         
         # METHOD 3: Gradient peak
         if len(sensor_locations) >= 3:
-            gradients = np.gradient(pressure_changes, sensor_locations)
+            gradients = layout.gradient(pressure_changes)
             peak_gradient_idx = np.argmax(np.abs(gradients))
             estimate_gradient = sensor_locations[peak_gradient_idx]
         else:
@@ -245,47 +487,498 @@ class LeakDetectionModel:
         
         return results
     
-    def get_sensor_analysis(self, sensor_locations, normal_pressure, drop_pressure, 
-                           sensor_names=None):
-        """Get detailed sensor analysis for reporting"""
+    def predict_batch(self, sensor_locations, normal_pressure, drop_pressure):
+        """
+        Predict many snapshots against one sensor layout in a single pass.
+        
+        sensor_locations: (sensors,)
+        normal_pressure:  (scenarios, sensors) or (sensors,) shared baseline
+        drop_pressure:    (scenarios, sensors)
+        
+        Returns a dict of numpy arrays, one entry per scenario. Class columns
+        are integer codes into CONFIDENCE_LABELS / SEVERITY_LABELS (action and
+        priority follow severity via ACTION_LABELS / PRIORITY_LABELS), and
+        'estimates' holds the five method estimates in METHOD_ORDER (NaN when
+        the midpoint is undefined). 'suspicion_index' holds the per-sensor
+        scores (scenarios, sensors).
+        """
+        sensor_locations = np.asarray(sensor_locations, dtype=float)
+        layout = self.layout_for(sensor_locations)
+        drop_pressure = np.atleast_2d(np.asarray(drop_pressure, dtype=float))
+        normal_pressure = np.broadcast_to(
+            np.asarray(normal_pressure, dtype=float), drop_pressure.shape
+        )
+        n_scenarios, n_sensors = drop_pressure.shape
+        rows = np.arange(n_scenarios)
+        
         pressure_changes = normal_pressure - drop_pressure
         pressure_ratios = drop_pressure / normal_pressure
-        suspicion_scores = self._calculate_suspicion_index(
-            sensor_locations, pressure_changes, pressure_ratios
+        
+        # Suspicion index, same formula as _calculate_suspicion_index per row
+        max_change = pressure_changes.max(axis=1, keepdims=True)
+        drop_ratios = 1 - pressure_ratios
+        max_drop_ratio = drop_ratios.max(axis=1, keepdims=True)
+        has_change = max_change > 0
+        safe_max_change = np.where(has_change, max_change, 1.0)
+        safe_max_ratio = np.where(max_drop_ratio > 0, max_drop_ratio, 1.0)
+        
+        norm_changes = np.where(has_change, pressure_changes / safe_max_change, pressure_changes)
+        norm_ratios = np.where(max_drop_ratio > 0, drop_ratios / safe_max_ratio, drop_ratios)
+        neighbor_diffs = np.abs(np.diff(pressure_changes, axis=1))
+        neighbor_score = np.zeros_like(pressure_changes)
+        neighbor_score[:, 1:] += neighbor_diffs
+        neighbor_score[:, :-1] += neighbor_diffs
+        neighbor_score = np.where(has_change, neighbor_score / safe_max_change, 0.0)
+        suspicion_scores = 0.4 * norm_changes + 0.3 * norm_ratios + 0.3 * neighbor_score
+        
+        top_sensor_idx = suspicion_scores.argmax(axis=1)
+        estimates = np.empty((n_scenarios, len(METHOD_ORDER)))
+        
+        # METHOD 1: Suspicion Index Peak
+        estimates[:, 0] = sensor_locations[top_sensor_idx] - self.upstream_bias
+        
+        # METHOD 2: Midpoint between sensors (undefined when the top sensor is the first)
+        estimates[:, 1] = layout.midpoints[top_sensor_idx]
+        
+        # METHOD 3: Gradient peak
+        if n_sensors >= 3:
+            gradients = layout.gradient(pressure_changes)
+            estimates[:, 2] = sensor_locations[np.abs(gradients).argmax(axis=1)]
+        else:
+            estimates[:, 2] = estimates[:, 0]
+        
+        # METHOD 4: Maximum pressure drop
+        estimates[:, 3] = sensor_locations[pressure_changes.argmax(axis=1)] - self.upstream_bias
+        
+        # METHOD 5: Weighted average
+        weights = suspicion_scores / suspicion_scores.sum(axis=1, keepdims=True)
+        estimates[:, 4] = (sensor_locations * weights).sum(axis=1)
+        
+        # Combine all methods, dropping the midpoint weight where it is undefined
+        # (any other NaN, e.g. weighted_avg with no pressure change, propagates like in predict())
+        valid = np.ones(estimates.shape, dtype=bool)
+        valid[:, 1] = ~np.isnan(estimates[:, 1])
+        method_weights = np.array([
+            self.method_weights['suspicion_index'], self.method_weights['midpoint'],
+            self.method_weights['gradient'], self.method_weights['pressure_drop'],
+            self.method_weights['weighted_avg']
+        ])
+        combine_weights = np.where(valid, method_weights, 0.0)
+        combine_weights /= combine_weights.sum(axis=1, keepdims=True)
+        
+        final_estimate = (np.where(valid, estimates, 0.0) * combine_weights).sum(axis=1)
+        estimate_std = np.where(
+            np.isnan(np.delete(estimates, 1, axis=1)).any(axis=1),
+            np.nan, np.nanstd(estimates, axis=1)
+        )
+        
+        # Confidence: <1 VERY HIGH, <3 HIGH, <5 MODERATE, else LOW
+        confidence = np.digitize(estimate_std, [1.0, 3.0, 5.0]).astype(np.int8)
+        
+        # Severity: >10 CRITICAL, >5 HIGH, >2 MODERATE, else LOW
+        avg_drop_pct = pressure_changes.mean(axis=1) / 200 * 100
+        severity = np.digitize(avg_drop_pct, [2, 5, 10], right=True).astype(np.int8)
+        
+        return {
+            'final_estimate': final_estimate,
+            'estimate_std': estimate_std,
+            'confidence': confidence,
+            'top_sensor_idx': top_sensor_idx,
+            'estimates': estimates,
+            # fmax/fmin keep the bound for a NaN estimate, like max()/min() in predict()
+            'focus_zone': np.stack([
+                np.fmax(0, final_estimate - 3.0),
+                np.fmin(self.pipeline_length, final_estimate + 3.0)
+            ], axis=1),
+            'critical_zone': np.stack([
+                np.fmax(0, final_estimate - 1.5),
+                np.fmin(self.pipeline_length, final_estimate + 1.5)
+            ], axis=1),
+            'severity': severity,
+            'avg_pressure_drop_pct': avg_drop_pct,
+            'suspicion_index': suspicion_scores
+        }
+    
+    def localize(self, sensor_locations, pressure_changes, suspicion_scores,
+                 resolution=GRID_RESOLUTION, source='live'):
+        """
+        Leak location on a dense KP grid instead of sensor positions / midpoints.
+        
+        The suspicion index, |pressure gradient| and pressure drop are
+        interpolated onto the grid (one matrix product with the layout's
+        cached basis), scaled to [0, 1] within the sensor span and combined
+        with method_weights. pressure_changes / suspicion_scores are
+        (sensors,) or (scenarios, sensors). source='trained' evaluates the
+        interpolators fitted by train() instead of the live readings.
+        
+        Returns the grid, the estimate (grid argmax within the sensor span),
+        the profile normalised to sum to 1 per scenario (zero outside the
+        sensor span), its peak and the central 90% interval.
+        """
+        if source not in LOCALIZE_SOURCES:
+            raise ValueError(f"Unknown localize source: {source} (use {', '.join(LOCALIZE_SOURCES)})")
+        
+        if source == 'trained':
+            grid, curves, inside = self._trained_curves(resolution)
+        else:
+            layout = self.layout_for(np.asarray(sensor_locations, dtype=float))
+            grid, basis, inside = layout.grid_basis(self.pipeline_length, resolution)
+            changes = np.asarray(pressure_changes, dtype=float)
+            scenarios = changes.shape[0] if changes.ndim == 2 else 1
+            nbytes = len(GRID_CURVES) * scenarios * len(grid) * 8
+            if nbytes > LOCALIZE_MAX_BYTES:
+                raise ValueError(f'Localization too large: {scenarios} scenarios x {len(grid)} grid points '
+                                 f'(max {LOCALIZE_MAX_BYTES // 2**20} MB, use a coarser resolution)')
+            values = np.stack([
+                np.asarray(suspicion_scores, dtype=float),
+                np.abs(layout.gradient(changes)),
+                changes
+            ])
+            curves = values @ basis.T  # (curves, [scenarios,] grid)
+        
+        # Cubic overshoot below zero carries no evidence
+        curves = np.maximum(curves, 0.0)
+        span = curves[..., inside]
+        low = span.min(axis=-1, keepdims=True)
+        scale = span.max(axis=-1, keepdims=True) - low
+        scaled = np.divide(curves - low, scale, out=np.zeros(curves.shape), where=scale > 0)
+        scaled = np.clip(scaled, 0.0, 1.0)
+        
+        weights = np.array([self.method_weights[name] for name in GRID_CURVES], dtype=float)
+        weights /= weights.sum()
+        combined = np.tensordot(weights, scaled, axes=1)  # ([scenarios,] grid)
+        # Held end values beyond the outer sensors carry no evidence either: keep the
+        # profile (and so the interval) within the sensor span, like the estimate
+        combined = np.where(inside, combined, 0.0)
+        
+        total = combined.sum(axis=-1, keepdims=True)
+        uniform = np.broadcast_to(inside / inside.sum(), combined.shape)
+        profile = np.divide(combined, total, out=np.array(uniform, dtype=float), where=total > 0)
+        peak_idx = np.where(inside, profile, -np.inf).argmax(axis=-1)
+        cdf = np.cumsum(profile, axis=-1)
+        
+        return {
+            'grid': grid,
+            'estimate': grid[peak_idx],
+            'peak_probability': np.take_along_axis(profile, peak_idx[..., None], axis=-1)[..., 0],
+            'interval': np.stack([
+                grid[(cdf < 0.05).sum(axis=-1)],
+                grid[(cdf < 0.95).sum(axis=-1).clip(max=len(grid) - 1)]
+            ], axis=-1),
+            'profile': profile
+        }
+    
+    def _trained_curves(self, resolution):
+        """
+        Trained suspicion / |gradient| / drop curves on the grid (the last
+        MAX_TRAINED_GRIDS resolutions are cached). Uses the interp1d functions from train() when they can
+        be evaluated, otherwise the same fit from training_data (compiled
+        artifacts, pickles from another scipy version).
+        """
+        resolution = check_resolution(resolution)
+        cache = getattr(self, '_trained_grids', None)
+        if cache is None:
+            cache = self._trained_grids = OrderedDict()
+        if resolution in cache:
+            cache.move_to_end(resolution)
+            return cache[resolution]
+        
+        training = getattr(self, 'training_data', None)
+        if not training:
+            raise ValueError('Model has no training data for source=trained')
+        locations = np.asarray(training['sensor_locations'], dtype=float)
+        layout = self.layout_for(locations)
+        grid, basis, inside = layout.grid_basis(self.pipeline_length, resolution)
+        
+        curves = None
+        funcs = (self.suspicion_index_func, self.gradient_func, self.pressure_drop_func)
+        if all(func is not None for func in funcs):
+            at = np.clip(grid, locations.min(), locations.max())
+            try:
+                curves = np.stack([func(at) for func in funcs])
+            except Exception:
+                # interp1d pickled by another scipy version may not evaluate; refit below
+                curves = None
+        if curves is None:
+            changes = np.asarray(training['pressure_changes'], dtype=float)
+            values = np.stack([
+                np.asarray(training['suspicion_scores'], dtype=float),
+                np.abs(np.gradient(changes, locations)),
+                changes
+            ])
+            curves = values @ basis.T
+        
+        cache[resolution] = (grid, curves, inside)
+        if len(cache) > MAX_TRAINED_GRIDS:
+            cache.popitem(last=False)
+        return grid, curves, inside
+    
+    def get_sensor_analysis(self, sensor_locations, normal_pressure, drop_pressure, 
+                           sensor_names=None, state=None):
+        """
+        Get detailed sensor analysis for reporting. state is an optional
+        precomputed (changes, ratios, scores) tuple, e.g. one row of predict_batch().
+        """
+        pressure_changes, pressure_ratios, suspicion_scores = state or self._sensor_state(
+            sensor_locations, normal_pressure, drop_pressure
         )
         
         if sensor_names is None:
             sensor_names = [f"Sensor {i+1}" for i in range(len(sensor_locations))]
         
-        sensors_data = []
-        for i in range(len(sensor_locations)):
-            sensors_data.append({
-                'sensor_name': sensor_names[i],
-                'kp': float(sensor_locations[i]),
-                'normal_pressure': float(normal_pressure[i]),
-                'drop_pressure': float(drop_pressure[i]),
-                'pressure_change': float(pressure_changes[i]),
-                'pressure_ratio': float(pressure_ratios[i]),
-                'suspicion_index': float(suspicion_scores[i])
-            })
-        
-        # Sort by suspicion index
-        sensors_ranked = sorted(sensors_data, key=lambda x: x['suspicion_index'], reverse=True)
+        # Convert whole columns once instead of float() per field
+        columns = zip(
+            sensor_names,
+            np.asarray(sensor_locations, dtype=float).tolist(),
+            np.asarray(normal_pressure, dtype=float).tolist(),
+            np.asarray(drop_pressure, dtype=float).tolist(),
+            np.asarray(pressure_changes, dtype=float).tolist(),
+            np.asarray(pressure_ratios, dtype=float).tolist(),
+            np.asarray(suspicion_scores, dtype=float).tolist()
+        )
+        sensors_data = [
+            {
+                'sensor_name': name,
+                'kp': kp,
+                'normal_pressure': normal,
+                'drop_pressure': drop,
+                'pressure_change': change,
+                'pressure_ratio': ratio,
+                'suspicion_index': score
+            }
+            for name, kp, normal, drop, change, ratio, score in columns
+        ]
+        
+        # Sort by suspicion index (stable, highest first)
+        order = np.argsort(-np.asarray(suspicion_scores, dtype=float), kind='stable')
+        sensors_ranked = [sensors_data[i] for i in order]
         for idx, sensor in enumerate(sensors_ranked):
             sensor['rank'] = idx + 1
         
         return sensors_data, sensors_ranked
 
 
+# =============================================================================
+# STREAMING MODE
+# =============================================================================
+
+# Default move of the cheap weighted-average estimate (km) that triggers a full predict()
+STREAM_ESTIMATE_THRESHOLD = 0.5
+
+
+class LeakStream:
+    """
+    Stateful scoring for live pressure ticks on one sensor layout.
+    
+    Keeps the latest normal/drop vectors. A tick updates one sensor's change,
+    ratio and neighbour differences in place; the suspicion scores are then
+    renormalised (same arithmetic as _calculate_suspicion_index). The full
+    ensemble (predict()) only re-runs when the top-suspicion sensor changes,
+    the weighted-average estimate moves by estimate_threshold km or more, or
+    the severity band changes.
+    
+    baseline is an optional BaselineEngine for raw readings (see observe());
+    verbose=False leaves the per-sensor arrays out of stream responses.
+    """
+    
+    def __init__(self, model, layout, normal_pressure, drop_pressure=None,
+                 estimate_threshold=STREAM_ESTIMATE_THRESHOLD, baseline=None, verbose=True):
+        self.model = model
+        self.layout = layout
+        self.estimate_threshold = float(estimate_threshold)
+        self.baseline = baseline
+        self.verbose = bool(verbose)
+        self.normal = np.array(normal_pressure, dtype=float)
+        self.drop = np.array(normal_pressure if drop_pressure is None else drop_pressure, dtype=float)
+        if not (len(self.normal) == len(self.drop) == len(layout.locations)):
+            raise ValueError('Sensor data arrays must have the same length')
+        
+        self.changes = self.normal - self.drop
+        self.ratios = self.drop / self.normal
+        self.drop_ratios = 1 - self.ratios
+        # |change[i] - change[i+1]|, and per sensor the sum over both neighbours
+        self.neighbor_diffs = np.abs(np.diff(self.changes))
+        self.neighbor_sum = np.zeros(len(self.changes))
+        self.neighbor_sum[1:] += self.neighbor_diffs
+        self.neighbor_sum[:-1] += self.neighbor_diffs
+        
+        self.ticks = 0
+        self.runs = 0
+        self.results = None
+        self._trigger = None  # (top sensor, weighted estimate, severity band) of the last run
+    
+    def sensor_index(self, sensor):
+        """Tick target as an index or a registered sensor name"""
+        if isinstance(sensor, str):
+            names = self.layout.sensor_names or []
+            if sensor not in names:
+                raise ValueError(f'Unknown sensor: {sensor}')
+            return names.index(sensor)
+        index = int(sensor)
+        if not 0 <= index < len(self.changes):
+            raise ValueError(f'Sensor index out of range: {sensor}')
+        return index
+    
+    def tick(self, sensor, drop_pressure, normal_pressure=None):
+        """Apply one reading in O(1); returns the sensor index"""
+        i = self.sensor_index(sensor)
+        if normal_pressure is not None:
+            self.normal[i] = normal_pressure
+        self.drop[i] = drop_pressure
+        self.changes[i] = self.normal[i] - self.drop[i]
+        self.ratios[i] = self.drop[i] / self.normal[i]
+        self.drop_ratios[i] = 1 - self.ratios[i]
+        
+        last = len(self.changes) - 1
+        if i > 0:
+            self.neighbor_diffs[i - 1] = abs(self.changes[i] - self.changes[i - 1])
+        if i < last:
+            self.neighbor_diffs[i] = abs(self.changes[i] - self.changes[i + 1])
+        # Same summation order as _calculate_suspicion_index: left neighbour first, then right
+        for j in range(max(i - 1, 0), min(i + 1, last) + 1):
+            total = 0.0
+            if j > 0:
+                total += self.neighbor_diffs[j - 1]
+            if j < last:
+                total += self.neighbor_diffs[j]
+            self.neighbor_sum[j] = total
+        self.ticks += 1
+        return i
+    
+    def observe(self, sensor, psi):
+        """
+        Apply one raw reading through the baseline engine: the rolling baseline
+        (history before this reading) becomes the sensor's normal pressure and
+        the reading its drop pressure. Returns the sensor index.
+        """
+        if self.baseline is None:
+            raise ValueError('Stream has no baseline engine (open it with "baseline")')
+        i = self.sensor_index(sensor)
+        normal, psi = self.baseline.update(i, psi)
+        return self.tick(i, psi, None if np.isnan(normal) else normal)
+    
+    def scores(self):
+        """Suspicion scores for the current vectors"""
+        max_change = np.max(self.changes)
+        max_drop_ratio = np.max(self.drop_ratios)
+        norm_changes = self.changes / max_change if max_change > 0 else self.changes
+        norm_ratios = self.drop_ratios / max_drop_ratio if max_drop_ratio > 0 else self.drop_ratios
+        if max_change > 0:
+            neighbor_score = self.neighbor_sum / max_change
+        else:
+            neighbor_score = np.zeros(len(self.changes))
+        return 0.4 * norm_changes + 0.3 * norm_ratios + 0.3 * neighbor_score
+    
+    def _estimate_moved(self, estimate, previous):
+        """Threshold check; NaN (no pressure change) only counts when it appears or disappears"""
+        if np.isnan(estimate) or np.isnan(previous):
+            return np.isnan(estimate) != np.isnan(previous)
+        return abs(estimate - previous) >= self.estimate_threshold
+    
+    def evaluate(self, force=False):
+        """
+        Re-run predict() if a trigger moved. Returns the reason ('initial',
+        'top_sensor', 'estimate', 'severity', 'forced') or None when the last
+        results still stand.
+        """
+        scores = self.scores()
+        top = int(np.argmax(scores))
+        weighted = float(np.sum(self.layout.locations * (scores / np.sum(scores))))
+        severity = int(np.digitize(np.mean(self.changes) / 200 * 100, [2, 5, 10], right=True))
+        
+        if self._trigger is None:
+            reason = 'initial'
+        elif force:
+            reason = 'forced'
+        elif top != self._trigger[0]:
+            reason = 'top_sensor'
+        elif severity != self._trigger[2]:
+            reason = 'severity'
+        elif self._estimate_moved(weighted, self._trigger[1]):
+            reason = 'estimate'
+        else:
+            return None
+        
+        state = (self.changes.copy(), self.ratios.copy(), scores)
+        self.results = self.model.predict(self.layout.locations, self.normal, self.drop, state=state)
+        self._trigger = (top, weighted, severity)
+        self.runs += 1
+        return reason
+
+
 # =============================================================================
 # LOAD MODEL
 # =============================================================================
 
+JMR_ARTIFACT_KIND = 'jmr_leak_detection'
+
+
+class _ModelUnpickler(pickle.Unpickler):
+    """
+    Models are pickled from this script run as __main__. Resolve the class
+    from this module so the .sav also loads when it is imported (batch_score.py).
+    """
+    def find_class(self, module, name):
+        if module == '__main__' and name == 'LeakDetectionModel':
+            return LeakDetectionModel
+        return super().find_class(module, name)
+
+
+def _unpickle(model_path):
+    with open(model_path, 'rb') as f:
+        return _ModelUnpickler(f).load()
+
+
+def compile_artifact(model_path):
+    """
+    Write the memory-mapped sidecar artifact for a pickled model: scalar
+    parameters and metadata in the manifest, training arrays as .npy.
+    The interp1d functions are not stored; they can be refitted from
+    training_data exactly as train() built them.
+    """
+    model_package = _unpickle(model_path)
+    
+    model = model_package['model']
+    arrays = {
+        f'training_{name}': np.asarray(values, dtype=float)
+        for name, values in getattr(model, 'training_data', {}).items()
+    }
+    meta = {
+        'metadata': model_package['metadata'],
+        'pipeline_length': model.pipeline_length,
+        'psi_per_meter': model.psi_per_meter,
+        'upstream_bias': model.upstream_bias,
+        'method_weights': model.method_weights
+    }
+    return save_artifact(model_path, JMR_ARTIFACT_KIND, arrays, meta)
+
+
+def _load_artifact_package(model_path):
+    """Model package rebuilt from a valid compiled artifact, or None"""
+    loaded = load_artifact(model_path, JMR_ARTIFACT_KIND)
+    if loaded is None:
+        return None
+    
+    arrays, meta = loaded
+    model = LeakDetectionModel(meta['pipeline_length'], meta['psi_per_meter'], meta['upstream_bias'])
+    model.method_weights = meta['method_weights']
+    model.training_data = {
+        name[len('training_'):]: values for name, values in arrays.items()
+    }
+    return {'model': model, 'metadata': meta['metadata'], 'training_data': model.training_data}
+
+
+def _load_package(model_path):
+    model_package = _load_artifact_package(model_path)
+    if model_package is not None:
+        return model_package
+    return _unpickle(model_path)
+
+
 def load_model(model_path):
-    """Load trained model from .sav file"""
+    """Load trained model from its compiled artifact or .sav file (cached per path + mtime, see model_cache.py)"""
     try:
-        with open(model_path, 'rb') as f:
-            model_package = pickle.load(f)
+        model_package = model_cache.get(model_path, _load_package)
         
         model = model_package['model']
         metadata = model_package['metadata']
@@ -298,12 +991,251 @@ def load_model(model_path):
         return None, None, f"Error loading model: {str(e)}"
 
 
+# =============================================================================
+# OUTPUT HELPERS
+# =============================================================================
+
+def _model_info(metadata):
+    return {
+        'version': metadata['version'],
+        'pipeline_length': metadata['pipeline_length'],
+        'inside_diameter': metadata['inside_diameter'],
+        'created_date': metadata['created_date']
+    }
+
+
+def batch_results_to_json(batch):
+    """Column-oriented view of predict_batch() arrays; json_output.dumps serializes the arrays directly"""
+    estimates = {}
+    for i, method in enumerate(METHOD_ORDER):
+        column = batch['estimates'][:, i]
+        if np.isnan(column).any():
+            estimates[method] = [None if np.isnan(v) else v for v in column.tolist()]
+        else:
+            estimates[method] = np.ascontiguousarray(column)
+    
+    return {
+        'count': len(batch['final_estimate']),
+        'final_estimate': batch['final_estimate'],
+        'estimate_std': batch['estimate_std'],
+        'confidence': CONFIDENCE_LABELS[batch['confidence']].tolist(),
+        'top_sensor_idx': batch['top_sensor_idx'],
+        'individual_estimates': estimates,
+        'focus_zone': batch['focus_zone'],
+        'critical_zone': batch['critical_zone'],
+        'severity': SEVERITY_LABELS[batch['severity']].tolist(),
+        'recommended_action': ACTION_LABELS[batch['severity']].tolist(),
+        'inspection_priority': PRIORITY_LABELS[batch['severity']].tolist(),
+        'avg_pressure_drop_pct': batch['avg_pressure_drop_pct']
+    }
+
+
+def batch_row_results(batch, i, state):
+    """predict()-shaped result for scenario i of predict_batch(); state = that row's (changes, ratios, scores)"""
+    pressure_changes, pressure_ratios, suspicion_scores = state
+    severity = batch['severity'][i]
+    focus_start, focus_end = batch['focus_zone'][i].tolist()
+    critical_start, critical_end = batch['critical_zone'][i].tolist()
+    return {
+        'final_estimate': float(batch['final_estimate'][i]),
+        'estimate_std': float(batch['estimate_std'][i]),
+        'confidence': str(CONFIDENCE_LABELS[batch['confidence'][i]]),
+        'top_sensor_idx': int(batch['top_sensor_idx'][i]),
+        'suspicion_index': suspicion_scores.tolist(),
+        'pressure_changes': pressure_changes.tolist(),
+        'pressure_ratios': pressure_ratios.tolist(),
+        'individual_estimates': {
+            method: None if np.isnan(value) else value
+            for method, value in zip(METHOD_ORDER, batch['estimates'][i].tolist())
+        },
+        'focus_zone': {
+            'start': focus_start,
+            'end': focus_end,
+            'width': focus_end - focus_start
+        },
+        'critical_zone': {
+            'start': critical_start,
+            'end': critical_end,
+            'width': critical_end - critical_start
+        },
+        'severity': str(SEVERITY_LABELS[severity]),
+        'recommended_action': str(ACTION_LABELS[severity]),
+        'inspection_priority': str(PRIORITY_LABELS[severity]),
+        'avg_pressure_drop_pct': float(batch['avg_pressure_drop_pct'][i])
+    }
+
+
+def localize_options(input_data):
+    """
+    Grid localization options from "localize": true or
+    {"resolution": km, "source": "live"|"trained", "profile": bool}; None when not requested.
+    """
+    value = input_data.get('localize')
+    if not value:
+        return None
+    options = value if isinstance(value, dict) else {}
+    source = options.get('source', 'live')
+    if source not in LOCALIZE_SOURCES:
+        raise ValueError(f"Unknown localize source: {source} (use {', '.join(LOCALIZE_SOURCES)})")
+    try:
+        resolution = check_resolution(options.get('resolution', GRID_RESOLUTION))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'Invalid localize resolution: {e}')
+    return {
+        'resolution': resolution,
+        'source': source,
+        'profile': bool(options.get('profile', False))
+    }
+
+
+def localization_json(localization, options):
+    """Response block for localize(); the full profile only when options['profile'] is set"""
+    grid = localization['grid']
+    estimate = localization['estimate']
+    interval = localization['interval']
+    output = {
+        'source': options['source'],
+        # A one-point grid (coarse resolution on a short line) has no step
+        'resolution': float(grid[1] - grid[0]) if len(grid) > 1 else options['resolution'],
+        'grid_points': len(grid),
+        'estimate': estimate.tolist(),
+        'peak_probability': localization['peak_probability'].tolist(),
+        'interval_90': {'start': interval[..., 0].tolist(), 'end': interval[..., 1].tolist()}
+    }
+    if options['profile']:
+        output['grid_start'] = float(grid[0])
+        output['profile'] = localization['profile']
+    return output
+
+
+def parse_input(input_data, model):
+    """
+    Sensor arrays and options from one request payload:
+    (sensor_locations, normal_pressure, drop_pressure, sensor_names, verbose, localize).
+    A payload may send "layout_id" (from an earlier response) instead of
+    sensor_locations / sensor_names.
+    Raises KeyError for a missing field and ValueError for mismatched lengths
+    or an unknown layout.
+    """
+    if 'sensor_locations' not in input_data and 'layout_id' in input_data:
+        layout = model.get_layout(input_data['layout_id'])
+        if layout is None:
+            raise ValueError(f"Unknown layout_id: {input_data['layout_id']} "
+                             "(send sensor_locations to register the layout again)")
+        sensor_locations = layout.locations
+        sensor_names = input_data.get('sensor_names', layout.sensor_names)
+    else:
+        sensor_locations = np.array(input_data['sensor_locations'])
+        sensor_names = input_data.get('sensor_names', None)
+    normal_pressure = np.array(input_data['normal_pressure'])
+    drop_pressure = np.array(input_data['drop_pressure'])
+    verbose = input_data.get('verbose', True)
+    localize = localize_options(input_data)
+    
+    # Batch mode: drop_pressure is (scenarios x sensors)
+    if drop_pressure.ndim == 2:
+        mismatch = (drop_pressure.shape[1] != len(sensor_locations) or
+                    normal_pressure.shape[-1] != len(sensor_locations))
+    else:
+        mismatch = (len(sensor_locations) != len(normal_pressure) or
+                    len(sensor_locations) != len(drop_pressure))
+    if mismatch:
+        raise ValueError('Sensor data arrays must have the same length')
+    if sensor_names is not None and len(sensor_names) != len(sensor_locations):
+        raise ValueError(f'sensor_names has {len(sensor_names)} names for {len(sensor_locations)} sensors')
+    if sensor_names is not None and 'sensor_locations' in input_data and np.ndim(sensor_locations) == 1:
+        model.layout_for(sensor_locations, sensor_names)
+    
+    return sensor_locations, normal_pressure, drop_pressure, sensor_names, verbose, localize
+
+
+def batch_output(model, metadata, sensor_locations, normal_pressure, drop_pressure, localize=None):
+    """Response for a batch request (2D drop_pressure)"""
+    batch = model.predict_batch(sensor_locations, normal_pressure, drop_pressure)
+    output = {
+        'success': True,
+        'timestamp': datetime.now().isoformat(),
+        'model_info': _model_info(metadata),
+        'batch': batch_results_to_json(batch),
+        'sensors': {
+            'active_count': len(sensor_locations),
+            'layout_id': model.layout_for(sensor_locations).layout_id
+        }
+    }
+    
+    if localize is not None:
+        localization = model.localize(
+            sensor_locations, normal_pressure - drop_pressure, batch['suspicion_index'],
+            localize['resolution'], localize['source']
+        )
+        output['localization'] = localization_json(localization, localize)
+    
+    return output
+
+
+def single_output(model, metadata, sensor_locations, normal_pressure, drop_pressure,
+                  sensor_names=None, verbose=True, localize=None, results=None, state=None):
+    """Response for one snapshot; results/state may come from a shared predict_batch() call"""
+    # Run prediction
+    if results is None:
+        results = model.predict(sensor_locations, normal_pressure, drop_pressure)
+    
+    # Get sensor analysis
+    sensors_data, sensors_ranked = model.get_sensor_analysis(
+        sensor_locations, normal_pressure, drop_pressure, sensor_names, state=state
+    )
+    
+    output = {
+        'success': True,
+        'timestamp': datetime.now().isoformat(),
+        'model_info': _model_info(metadata),
+        'prediction': results,
+        'sensors': {
+            'active_count': len(sensor_locations),
+            'layout_id': model.layout_for(sensor_locations, sensor_names).layout_id,
+            'data': sensors_data,
+            'ranked': sensors_ranked[:5]  # Top 5
+        }
+    }
+    
+    # Refined location on the dense KP grid
+    if localize is not None:
+        pressure_changes, _, suspicion_scores = state or model._sensor_state(
+            sensor_locations, normal_pressure, drop_pressure
+        )
+        localization = model.localize(
+            sensor_locations, pressure_changes, suspicion_scores,
+            localize['resolution'], localize['source']
+        )
+        output['localization'] = localization_json(localization, localize)
+    
+    # Estimate-only callers skip the per-sensor arrays
+    if not verbose:
+        for field in VERBOSE_FIELDS:
+            del results[field]
+        del output['sensors']['data']
+    
+    return output
+
+
+def error_output(error):
+    """Error response in the same shape main() prints"""
+    if isinstance(error, json.JSONDecodeError):
+        message = f'Invalid JSON input: {str(error)}'
+    elif isinstance(error, KeyError):
+        message = f'Missing required field: {str(error)}'
+    else:
+        message = str(error)
+    return {'success': False, 'error': message}
+
+
 # =============================================================================
 # MAIN EXECUTION FOR API MODE
 # =============================================================================
 
-def main():
+def main(pretty=False, profile=None):
     """Main execution for API mode - receives JSON from stdin"""
+    profile = profile or StartupProfile(SCRIPT_START, enabled=False)
     
     try:
         # Get model path from command line argument
@@ -320,6 +1252,7 @@ def main():
         
         # Load model
         model, metadata, error = load_model(model_path)
+        profile.mark('model_load')
         
         if error:
             error_response = {
@@ -331,76 +1264,347 @@ def main():
         
         # Read JSON input from stdin
         input_data = json.loads(sys.stdin.read())
+        profile.mark('read_input')
         
-        # Extract required parameters
-        sensor_locations = np.array(input_data['sensor_locations'])
-        normal_pressure = np.array(input_data['normal_pressure'])
-        drop_pressure = np.array(input_data['drop_pressure'])
-        sensor_names = input_data.get('sensor_names', None)
-        
-        # Validate input
-        if len(sensor_locations) != len(normal_pressure) or len(sensor_locations) != len(drop_pressure):
-            error_response = {
-                'success': False,
-                'error': 'Sensor data arrays must have the same length'
-            }
-            print(json.dumps(error_response))
-            sys.exit(1)
-        
-        # Run prediction
-        results = model.predict(sensor_locations, normal_pressure, drop_pressure)
-        
-        # Get sensor analysis
-        sensors_data, sensors_ranked = model.get_sensor_analysis(
-            sensor_locations, normal_pressure, drop_pressure, sensor_names
+        sensor_locations, normal_pressure, drop_pressure, sensor_names, verbose, localize = parse_input(
+            input_data, model
         )
         
-        # Prepare output
-        output = {
-            'success': True,
-            'timestamp': datetime.now().isoformat(),
-            'model_info': {
-                'version': metadata['version'],
-                'pipeline_length': metadata['pipeline_length'],
-                'inside_diameter': metadata['inside_diameter'],
-                'created_date': metadata['created_date']
-            },
-            'prediction': results,
-            'sensors': {
-                'active_count': len(sensor_locations),
-                'data': sensors_data,
-                'ranked': sensors_ranked[:5]  # Top 5
-            }
-        }
+        if drop_pressure.ndim == 2:
+            output = batch_output(model, metadata, sensor_locations, normal_pressure, drop_pressure, localize)
+        else:
+            output = single_output(model, metadata, sensor_locations, normal_pressure, drop_pressure,
+                                   sensor_names, verbose, localize)
+        profile.mark('predict')
         
         # Output JSON to stdout
-        print(json.dumps(output, indent=2))
+        print(dumps(output, pretty=pretty))
         sys.exit(0)
         
-    except json.JSONDecodeError as e:
-        error_response = {
-            'success': False,
-            'error': f'Invalid JSON input: {str(e)}'
-        }
-        print(json.dumps(error_response))
+    except Exception as e:
+        # Invalid JSON, missing fields and model errors share one response shape
+        print(json.dumps(error_output(e)))
         sys.exit(1)
+    
+    finally:
+        profile.report()
+
+
+# =============================================================================
+# WORKER MODE
+# =============================================================================
+
+def group_outputs(model, metadata, requests):
+    """
+    Responses for single-snapshot requests sharing one model and sensor layout.
+    More than one request is scored with a single predict_batch() call.
+    """
+    if len(requests) == 1:
+        return [single_output(model, metadata, *requests[0])]
+    
+    sensor_locations = requests[0][0]
+    batch = model.predict_batch(
+        sensor_locations,
+        np.stack([request[1] for request in requests]),
+        np.stack([request[2] for request in requests])
+    )
+    outputs = []
+    for i, (_, normal, drop, sensor_names, verbose, localize) in enumerate(requests):
+        state = (normal - drop, drop / normal, batch['suspicion_index'][i])
+        outputs.append(single_output(
+            model, metadata, sensor_locations, normal, drop, sensor_names, verbose, localize,
+            results=batch_row_results(batch, i, state), state=state
+        ))
+    return outputs
+
+
+def snapshot_memo_key(memo, parsed):
+    """
+    Result cache key of one single-snapshot request: model file, quantized
+    pressures, sensor layout and the options that shape the response
+    (None when memoization is off).
+    """
+    if memo is None:
+        return None
+    sensor_locations, normal_pressure, drop_pressure, sensor_names, verbose, localize = parsed
+    return result_cache.key(
+        memo[0], memo[1],
+        np.concatenate([np.ravel(normal_pressure), np.ravel(drop_pressure)]).tolist(),
+        sensor_locations.dtype.str, sensor_locations.tobytes(),
+        json.dumps(sensor_names), bool(verbose),
+        None if localize is None else tuple(sorted(localize.items()))
+    )
+
+
+def score_snapshots(model, metadata, input_datas, memo=None):
+    """
+    Responses for many stdin-style payloads on one model, in order. Single
+    snapshots sharing a sensor layout are scored with one predict_batch() call;
+    a payload with 2D drop_pressure gets a batch response; bad payloads get
+    their own error response.
+    memo: (model path, file signature) to reuse responses of repeated single
+    snapshots from result_cache (see result_cache.py); the timestamp is refreshed.
+    """
+    outputs = [None] * len(input_datas)
+    groups = {}  # layout -> [(position, parsed input, memo key)]
+    
+    for pos, input_data in enumerate(input_datas):
+        try:
+            if not isinstance(input_data, dict):
+                raise ValueError('Input must be a JSON object')
+            parsed = parse_input(input_data, model)
+            sensor_locations, normal_pressure, drop_pressure = parsed[:3]
+            if drop_pressure.ndim == 2:
+                outputs[pos] = batch_output(model, metadata, sensor_locations, normal_pressure, drop_pressure,
+                                            parsed[5])
+            else:
+                memo_key = snapshot_memo_key(memo, parsed)
+                cached = result_cache.get(memo_key)
+                if cached is not None:
+                    outputs[pos] = dict(cached, timestamp=datetime.now().isoformat())
+                    continue
+                key = (sensor_locations.dtype.str, sensor_locations.tobytes())
+                groups.setdefault(key, []).append((pos, parsed, memo_key))
+        except Exception as e:
+            outputs[pos] = error_output(e)
+    
+    for items in groups.values():
+        try:
+            results = group_outputs(model, metadata, [parsed for _, parsed, _ in items])
+        except Exception as e:
+            if len(items) == 1:
+                results = [error_output(e)]
+            else:
+                # One bad request must not fail the rest of its micro-batch: score each on its own
+                results = []
+                for _, parsed, _ in items:
+                    try:
+                        results.extend(group_outputs(model, metadata, [parsed]))
+                    except Exception as e:
+                        results.append(error_output(e))
+        for (pos, _, memo_key), output in zip(items, results):
+            if output['success']:
+                # Copy: the worker adds the request id to the response it sends
+                result_cache.put(memo_key, dict(output))
+            outputs[pos] = output
+    
+    return outputs
+
+
+# Open LeakStreams of this worker process by caller-chosen id (least recently used dropped first)
+MAX_STREAMS = 256
+STREAM_OPS = ('stream_open', 'stream_tick', 'stream_close')
+_streams = OrderedDict()
+
+
+def stream_output(stream_id, stream, reason):
+    """Stream response; the prediction is only included when the ensemble re-ran"""
+    output = {
+        'success': True,
+        'stream': stream_id,
+        'updated': reason is not None,
+        'reason': reason,
+        'ticks': stream.ticks,
+        'runs': stream.runs,
+        'layout_id': stream.layout.layout_id
+    }
+    if reason is not None:
+        results = stream.results
+        if not stream.verbose:
+            results = {k: v for k, v in results.items() if k not in VERBOSE_FIELDS}
+        output['timestamp'] = datetime.now().isoformat()
+        output['prediction'] = results
+    return output
+
+
+# Keys accepted in a stream's "baseline" object (BaselineEngine keyword arguments)
+BASELINE_OPTIONS = ('window', 'method', 'alpha', 'min_samples')
+
+
+def open_baseline(layout, data):
+    """
+    BaselineEngine for a new stream, warmed up from data['history'] (raw psi per
+    sensor, oldest first). data['baseline'] is true (default options) or an
+    object of BaselineEngine options. Returns (engine, normal_pressure, drop_pressure);
+    explicit normal_pressure / drop_pressure in data take precedence.
+    """
+    from baseline_engine import BaselineEngine
+    
+    options = data['baseline']
+    if options is True:
+        options = {}
+    if not isinstance(options, dict):
+        raise ValueError('baseline must be true or an object of BaselineEngine options')
+    unknown = set(options) - set(BASELINE_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown baseline option(s): {', '.join(sorted(unknown))} "
+                         f"(use {', '.join(BASELINE_OPTIONS)})")
+    
+    n_sensors = len(layout.locations)
+    engine = BaselineEngine(n_sensors, **options)
+    history = data.get('history') or []
+    if len(history) not in (0, n_sensors):
+        raise ValueError('history must hold one list of readings per sensor')
+    for i, readings in enumerate(history):
+        engine.extend(i, readings)
+    
+    normal_pressure = np.array(data['normal_pressure'], dtype=float) if 'normal_pressure' in data else engine.baselines()
+    if np.isnan(normal_pressure).any():
+        raise ValueError('Baseline needs history (or normal_pressure) for every sensor')
+    if 'drop_pressure' in data:
+        drop_pressure = data['drop_pressure']
+    else:
+        drop_pressure = np.where(np.isnan(engine.current), normal_pressure, engine.current)
+    return engine, normal_pressure, drop_pressure
+
+
+def handle_stream_request(request):
+    """
+    Streaming ops (see LeakStream):
+    {"op": "stream_open", "stream", "model", "data": {sensor_locations | layout_id,
+        sensor_names?, normal_pressure, drop_pressure?, estimate_threshold?, verbose?,
+        baseline?: true | {window?, method?, alpha?, min_samples?}, history?: [[psi, ...] per sensor]}}
+    {"op": "stream_tick", "stream", "model", "ticks": [{"sensor", "drop_pressure", "normal_pressure"?} or
+        {"sensor", "psi"} (raw reading, needs a baseline)], "force"?}
+    {"op": "stream_close", "stream"}
+    """
+    op = request['op']
+    stream_id = str(request['stream'])
+    if op == 'stream_close':
+        return {'success': True, 'stream': stream_id, 'closed': _streams.pop(stream_id, None) is not None}
+    
+    model, metadata, error = load_model(request['model'])
+    if error:
+        return {'success': False, 'error': error}
+    
+    if op == 'stream_open':
+        data = request['data']
+        if 'sensor_locations' not in data and 'layout_id' in data:
+            layout = model.get_layout(data['layout_id'])
+            if layout is None:
+                raise ValueError(f"Unknown layout_id: {data['layout_id']} "
+                                 "(send sensor_locations to register the layout again)")
+        else:
+            layout = model.layout_for(np.array(data['sensor_locations']), data.get('sensor_names'))
         
-    except KeyError as e:
-        error_response = {
-            'success': False,
-            'error': f'Missing required field: {str(e)}'
+        if data.get('baseline') not in (None, False):
+            baseline, normal_pressure, drop_pressure = open_baseline(layout, data)
+        else:
+            baseline, normal_pressure, drop_pressure = None, data['normal_pressure'], data.get('drop_pressure')
+        stream = LeakStream(
+            model, layout, normal_pressure, drop_pressure,
+            data.get('estimate_threshold', STREAM_ESTIMATE_THRESHOLD),
+            baseline=baseline, verbose=data.get('verbose', True)
+        )
+        _streams[stream_id] = stream
+        _streams.move_to_end(stream_id)
+        if len(_streams) > MAX_STREAMS:
+            _streams.popitem(last=False)
+        return stream_output(stream_id, stream, stream.evaluate())
+    
+    stream = _streams.get(stream_id)
+    if stream is None:
+        raise ValueError(f'Unknown stream: {stream_id} (send stream_open first)')
+    _streams.move_to_end(stream_id)
+    # Model file replaced since the stream was opened: continue on the new model
+    stream.model = model
+    
+    ticks = request['ticks']
+    indices = [stream.sensor_index(tick['sensor']) for tick in ticks]
+    for index, tick in zip(indices, ticks):
+        if 'psi' in tick:
+            stream.observe(index, tick['psi'])
+        else:
+            stream.tick(index, tick['drop_pressure'], tick.get('normal_pressure'))
+    return stream_output(stream_id, stream, stream.evaluate(force=request.get('force', False)))
+
+
+def handle_worker_lines(lines, scheduler_stats=None):
+    """
+    Handle the requests collected in one scheduler window (see micro_batch.py).
+    One JSON object per line: {"id", "model", "data"} where data is the
+    stdin payload of the one-shot mode, {"id", "op": "stats"} or a streaming
+    op (see handle_stream_request).
+    Requests are grouped per model and scored with score_snapshots();
+    repeated single snapshots are answered from result_cache.
+    Returns one response per line, in the same order.
+    """
+    outputs = [None] * len(lines)
+    ids = [None] * len(lines)
+    per_model = {}  # model path -> [(position, data)]
+    stats_requests = []  # answered last, after this window's predictions
+    
+    for pos, line in enumerate(lines):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('Worker request must be a JSON object')
+            ids[pos] = request.get('id')
+            if request.get('op') == 'stats':
+                stats_requests.append(pos)
+                continue
+            if request.get('op') in STREAM_OPS:
+                # Stateful, so handled right away in arrival order
+                outputs[pos] = handle_stream_request(request)
+                continue
+            per_model.setdefault(request['model'], []).append((pos, request['data']))
+        except Exception as e:
+            outputs[pos] = error_output(e)
+    
+    for model_path, items in per_model.items():
+        model, metadata, error = load_model(model_path)
+        if error:
+            results = [{'success': False, 'error': error} for _ in items]
+        else:
+            try:
+                memo = (model_path, file_signature(model_path))
+            except OSError:
+                memo = None
+            results = score_snapshots(model, metadata, [data for _, data in items], memo)
+        for (pos, _), output in zip(items, results):
+            outputs[pos] = output
+    
+    for pos in stats_requests:
+        outputs[pos] = {
+            'success': True,
+            'model_cache': model_cache.stats(),
+            'result_cache': result_cache.stats(),
+            'scheduler': scheduler_stats.to_dict() if scheduler_stats else None,
+            'streams': len(_streams)
         }
-        print(json.dumps(error_response))
+    
+    for pos, output in enumerate(outputs):
+        output['id'] = ids[pos]
+    return outputs
+
+
+def worker_main():
+    """--worker mode: long-lived process answering NDJSON requests on stdin"""
+    from micro_batch import serve
+    serve(handle_worker_lines)
+
+
+def compile_main(model_path):
+    """--compile mode: write the artifact once after the model is uploaded"""
+    try:
+        target = compile_artifact(model_path)
+        print(json.dumps({'success': True, 'artifact': target}))
+        sys.exit(0)
+    except FileNotFoundError:
+        print(json.dumps({'success': False, 'error': f'Model file not found: {model_path}'}))
         sys.exit(1)
-        
     except Exception as e:
-        error_response = {
-            'success': False,
-            'error': str(e)
-        }
-        print(json.dumps(error_response))
+        print(json.dumps({'success': False, 'error': f'Error compiling model: {str(e)}'}))
         sys.exit(1)
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    if pop_flag(sys.argv, '--compile'):
+        compile_main(sys.argv[1] if len(sys.argv) > 1 else '')
+    if pop_flag(sys.argv, '--worker'):
+        worker_main()
+        sys.exit(0)
+    
+    pretty = pop_flag(sys.argv, '--pretty')
+    profile = StartupProfile(SCRIPT_START, enabled=pop_flag(sys.argv, '--startup-profile'))
+    main(pretty=pretty, profile=profile)
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+import math
+
+# orjson opsional: lebih cepat dan bisa serialize array numpy langsung
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(obj):
+    """Fallback serializer untuk array/scalar numpy (tanpa import numpy)"""
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _finite(obj):
+    """NaN/inf -> None (sama dengan orjson), array numpy -> list, supaya fallback tetap JSON valid"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if hasattr(obj, "tolist"):
+        return _finite(obj.tolist())
+    return obj
+
+def dumps(obj, pretty=False):
+    """Serialize ke JSON satu baris (default untuk API) atau indent=2 jika pretty"""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option).decode()
+    obj = _finite(obj)
+    if pretty:
+        return json.dumps(obj, indent=2, default=_default, allow_nan=False)
+    return json.dumps(obj, separators=(",", ":"), default=_default, allow_nan=False)
+
+def pop_flag(argv, flag):
+    """Hapus flag (mis. --pretty) dari argv, return True jika ada"""
+    if flag in argv:
+        argv.remove(flag)
+        return True
+    return False
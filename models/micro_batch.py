@@ -0,0 +1,170 @@
+"""
+Scheduler micro-batch untuk mode --worker (prediction.py dan jmr_proxy_model.py).
+
+Request NDJSON dibaca langsung dari file descriptor stdin. Setelah request pertama
+tiba, scheduler masih menunggu request lain sampai window habis (hitungan dari
+request tertua) atau max_lines terkumpul, lalu semuanya diproses sebagai satu batch.
+Window 0 = hanya ambil request yang sudah menunggu, tanpa jeda tambahan.
+
+Statistik antrian (ukuran batch, kedalaman antrian, waktu tunggu per request,
+waktu proses per batch) dikumpulkan untuk tuning latency vs throughput.
+"""
+import os
+import select
+import sys
+import time
+from bisect import bisect_left
+
+from json_output import dumps
+
+# Jeda maksimum (ms) menunggu request lain sebelum batch diproses
+BATCH_WINDOW_MS = float(os.environ.get("PREDICTION_BATCH_WINDOW_MS", "2"))
+# Maksimum request yang digabung per batch
+WORKER_MAX_BATCH = int(os.environ.get("PREDICTION_WORKER_MAX_BATCH", "64"))
+
+# Batas atas bucket histogram
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+MS_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 50, 100, 500)
+
+class Histogram:
+    """Histogram bucket tetap (nilai <= batas bucket), plus count, mean dan max"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0,
+            "max": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+class BatchStats:
+    """Statistik scheduler selama umur proses worker"""
+
+    def __init__(self, window_ms, max_lines):
+        self.window_ms = window_ms
+        self.max_lines = max_lines
+        self.batches = 0
+        self.requests = 0
+        self.batch_size = Histogram(COUNT_BUCKETS)
+        self.queue_depth = Histogram(COUNT_BUCKETS)
+        self.wait_ms = Histogram(MS_BUCKETS)
+        self.service_ms = Histogram(MS_BUCKETS)
+
+    def record_batch(self, size, queued, waits_ms):
+        """queued = request di antrian saat batch diambil (termasuk batch itu sendiri)"""
+        self.batches += 1
+        self.requests += size
+        self.batch_size.add(size)
+        self.queue_depth.add(queued)
+        for wait in waits_ms:
+            self.wait_ms.add(wait)
+
+    def record_service(self, ms):
+        self.service_ms.add(ms)
+
+    def to_dict(self):
+        return {
+            "window_ms": self.window_ms,
+            "max_batch": self.max_lines,
+            "batches": self.batches,
+            "requests": self.requests,
+            "batch_size": self.batch_size.to_dict(),
+            "queue_depth": self.queue_depth.to_dict(),
+            "wait_ms": self.wait_ms.to_dict(),
+            "service_ms": self.service_ms.to_dict()
+        }
+
+class StdinLines:
+    """
+    Pembaca baris stdin langsung dari file descriptor (tanpa buffer Python),
+    supaya worker bisa mengambil semua request yang sudah menunggu sekaligus.
+    Tiap baris disimpan bersama waktu tibanya untuk statistik waktu tunggu.
+    """
+
+    def __init__(self, fd, window_ms=BATCH_WINDOW_MS, max_lines=WORKER_MAX_BATCH):
+        self.fd = fd
+        self.window = max(0.0, window_ms) / 1000
+        self.max_lines = max(1, max_lines)
+        self.partial = []  # chunk baris yang belum lengkap (di-join sekali saat "\n" tiba)
+        self.lines = []  # [(waktu tiba, baris)]
+        self.eof = False
+        self.stats = BatchStats(window_ms, self.max_lines)
+
+    def _fill(self, timeout):
+        """Baca chunk yang tersedia (tunggu maksimal timeout detik, None = blok), return True jika ada data"""
+        if self.eof:
+            return False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        chunk = os.read(self.fd, 65536)
+        now = time.perf_counter()
+        if not chunk:
+            self.eof = True
+            rest = b"".join(self.partial)
+            if rest.strip():
+                self.lines.append((now, rest))
+            self.partial = []
+            return False
+        if b"\n" not in chunk:
+            # Baris panjang (payload playback / batch rows): tunda join sampai baris lengkap
+            self.partial.append(chunk)
+            return True
+        head, *complete, tail = chunk.split(b"\n")
+        self.partial.append(head)
+        complete.insert(0, b"".join(self.partial))
+        self.partial = [tail] if tail else []
+        self.lines.extend((now, line) for line in complete if line.strip())
+        return True
+
+    def next_batch(self):
+        """
+        Blok sampai ada minimal satu baris, lalu kumpulkan baris lain sampai window
+        (dihitung dari baris tertua) habis atau max_lines terpenuhi. List kosong = EOF.
+        """
+        while not self.lines and not self.eof:
+            self._fill(None)
+        if not self.lines:
+            return []
+
+        deadline = self.lines[0][0] + self.window
+        while len(self.lines) < self.max_lines:
+            if not self._fill(max(0.0, deadline - time.perf_counter())):
+                break
+
+        now = time.perf_counter()
+        queued = len(self.lines)
+        batch, self.lines = self.lines[:self.max_lines], self.lines[self.max_lines:]
+        self.stats.record_batch(len(batch), queued, [(now - arrived) * 1000 for arrived, _ in batch])
+        return [line for _, line in batch]
+
+def serve(handle_lines, window_ms=BATCH_WINDOW_MS, max_lines=WORKER_MAX_BATCH):
+    """
+    Loop worker sampai stdin ditutup. handle_lines(lines, stats) menerima satu batch
+    baris request dan return list output (dict) dengan urutan yang sama.
+    """
+    reader = StdinLines(sys.stdin.fileno(), window_ms, max_lines)
+    while True:
+        lines = reader.next_batch()
+        if not lines:
+            break
+        start = time.perf_counter()
+        outputs = handle_lines(lines, reader.stats)
+        sys.stdout.write("".join(dumps(output) + "\n" for output in outputs))
+        sys.stdout.flush()
+        reader.stats.record_service((time.perf_counter() - start) * 1000)
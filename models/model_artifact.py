@@ -0,0 +1,64 @@
+"""
+Artifact model hasil compile: sidecar directory "<file model>.compiled/" berisi
+manifest.json + satu file .npy per array. Array di-load dengan mmap read-only,
+jadi beberapa proses worker berbagi page memori yang sama dan load tidak perlu unpickle.
+Artifact hanya dipakai jika versi format dan signature file model (mtime, size) cocok.
+"""
+import json
+import os
+import shutil
+
+from model_cache import file_signature
+
+ARTIFACT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+def artifact_path(model_path):
+    return model_path + ".compiled"
+
+def save_artifact(model_path, kind, arrays, meta):
+    """Tulis artifact (arrays: dict nama -> ndarray, meta: dict JSON) di samping file model"""
+    import numpy as np
+
+    target = artifact_path(model_path)
+    tmp = f"{target}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+    mtime_ns, size = file_signature(model_path)
+    manifest = {
+        "format_version": ARTIFACT_VERSION,
+        "kind": kind,
+        "source": {"file": os.path.basename(model_path), "mtime_ns": mtime_ns, "size": size},
+        "arrays": sorted(arrays),
+        "meta": meta
+    }
+    with open(os.path.join(tmp, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(tmp, target)
+    return target
+
+def load_artifact(model_path, kind):
+    """Load artifact (arrays di-mmap), return (arrays, meta) atau None jika tidak ada / kadaluarsa"""
+    target = artifact_path(model_path)
+    try:
+        with open(os.path.join(target, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        source = manifest["source"]
+        if (manifest["format_version"] != ARTIFACT_VERSION or manifest["kind"] != kind or
+                (source["mtime_ns"], source["size"]) != file_signature(model_path)):
+            return None
+
+        import numpy as np
+        arrays = {
+            name: np.load(os.path.join(target, f"{name}.npy"), mmap_mode="r", allow_pickle=False).view(np.ndarray)
+            for name in manifest["arrays"]
+        }
+        return arrays, manifest["meta"]
+    except (OSError, ValueError, KeyError):
+        return None
@@ -0,0 +1,99 @@
+import os
+import threading
+from collections import OrderedDict
+
+# Budget default, bisa di-override lewat environment
+DEFAULT_MAX_ENTRIES = int(os.environ.get("MODEL_CACHE_MAX_ENTRIES", "16"))
+DEFAULT_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+def file_signature(path):
+    """Signature file model: (mtime_ns, size). File yang diganti -> signature berubah"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+class ModelCache:
+    """
+    Cache LRU untuk model yang sudah di-unpickle.
+    Key = path absolut, entry valid selama mtime dan ukuran file tidak berubah.
+    Ukuran file dipakai sebagai perkiraan memori model untuk budget max_bytes.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # path -> (signature, model, nbytes)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, path, loader):
+        """Ambil model dari cache, panggil loader(path) jika belum ada atau file sudah berubah"""
+        key = os.path.abspath(path)
+        signature = file_signature(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                # File model diganti, buang entry lama
+                self._remove(key)
+                self.invalidations += 1
+
+            self.misses += 1
+            model = loader(path)
+            self._entries[key] = (signature, model, signature[1])
+            self._bytes += signature[1]
+            self._evict(keep=key)
+            return model
+
+    def _remove(self, key):
+        _, _, nbytes = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def _evict(self, keep):
+        """Buang entry paling lama dipakai sampai budget terpenuhi (entry terbaru selalu disimpan)"""
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, path=None):
+        """Hapus satu model (atau semua jika path None) dari cache"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            key = os.path.abspath(path)
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def stats(self):
+        """Counter cache untuk monitoring budget"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+# Instance bersama untuk satu proses
+model_cache = ModelCache()
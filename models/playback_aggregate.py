@@ -0,0 +1,225 @@
+"""
+Agregasi playback: rata-rata psi per (tanggal, time bucket, spot) untuk semua tanggal sekaligus.
+
+Baris mentah (spot_id, timestamp, psi) dikirim sebagai array kolom, lalu tiap baris
+diberi satu key gabungan (tanggal, bucket, spot) dan dijumlah dengan np.bincount,
+jadi tidak ada query atau loop per tanggal. Hasilnya langsung berbentuk
+data / chartData (categories, series) yang dipakai endpoint playback, dan matriks
+bucket x spot yang sama bisa dikirim sebagai batch "rows" ke prediction.py.
+
+Timestamp = detik sejak 1970-01-01 00:00:00 dari DATETIME apa adanya (tanpa konversi
+timezone), mis. TIMESTAMPDIFF(SECOND, '1970-01-01', timestamp) di MySQL.
+
+Dengan "table", tanggal yang sudah lewat dibaca dari cache spot_history (lihat spot_history.py):
+Node menanyakan tanggal yang basi lewat op "history_status", lalu hanya mengirim baris
+tanggal-tanggal itu.
+
+Usage: python3 models/playback_aggregate.py            (satu request JSON dari stdin)
+       python3 models/playback_aggregate.py --worker   (request NDJSON, dipakai Node)
+"""
+import json
+import math
+import sys
+from datetime import date
+
+import numpy as np
+
+import spot_history
+from json_output import dumps
+
+SECONDS_PER_DAY = 86400
+MINUTES_PER_DAY = 1440
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class PlaybackError(Exception):
+    pass
+
+def spot_key(value):
+    """Key pembanding spot: 3, 3.0 dan "3" dianggap spot yang sama (seperti key object di JS)"""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def date_only(value):
+    return str(value).split(" ")[0]
+
+def epoch_day(value):
+    """'YYYY-MM-DD' -> jumlah hari sejak 1970-01-01"""
+    try:
+        return date.fromisoformat(value).toordinal() - EPOCH_ORDINAL
+    except ValueError:
+        raise PlaybackError(f"Format tanggal tidak valid: {value}")
+
+def minutes_label(minutes):
+    minutes = int(minutes) if float(minutes).is_integer() else minutes
+    return f"{str(int(minutes // 60)).zfill(2)}:{str(minutes % 60).zfill(2)}"
+
+def bucket_label(bucket, time_range):
+    """Label bucket 'HH:MM - HH:MM' (bucket terakhir bisa berakhir di 24:00)"""
+    start = bucket * time_range
+    return f"{minutes_label(start)} - {minutes_label(start + time_range)}"
+
+def parse_time_range(value):
+    try:
+        time_range = float(value)
+    except (TypeError, ValueError):
+        raise PlaybackError("timeRange harus lebih dari 0")
+    if not time_range > 0:
+        raise PlaybackError("timeRange harus lebih dari 0")
+    return int(time_range) if time_range.is_integer() else time_range
+
+def bucket_means(spot_ids, seconds, psi, days, time_range, spot_keys):
+    """
+    Rata-rata psi per (hari, bucket, spot) dari array kolom.
+
+    days: hari (epoch) unik yang diminta, spot_keys: key spot unik yang diminta.
+    Return (means, counts) berbentuk (n_days, n_buckets, n_spots). counts menghitung
+    semua baris (termasuk psi NULL), means hanya dari psi yang ada (NaN jika tidak ada).
+    """
+    n_days, n_spots = len(days), len(spot_keys)
+    n_buckets = math.ceil(MINUTES_PER_DAY / time_range)
+    shape = (n_days, n_buckets, n_spots)
+
+    seconds = np.asarray(seconds, dtype=np.int64)
+    psi = np.asarray(psi, dtype=np.float64)
+    if len(spot_ids) != len(seconds) or len(seconds) != len(psi):
+        raise PlaybackError("Panjang kolom spot_id, timestamp dan psi harus sama")
+    if len(seconds) == 0:
+        return np.full(shape, np.nan), np.zeros(shape, dtype=np.int64)
+
+    # spot_id -> index spot, lewat nilai unik saja (jumlah spot jauh lebih kecil dari jumlah baris)
+    unique_ids, inverse = np.unique(np.asarray(spot_ids), return_inverse=True)
+    positions = {key: i for i, key in enumerate(spot_keys)}
+    spot_index = np.array([positions.get(spot_key(v), -1) for v in unique_ids.tolist()], dtype=np.int64)[inverse]
+
+    # hari -> index tanggal yang diminta
+    order = np.argsort(days)
+    sorted_days = np.asarray(days, dtype=np.int64)[order]
+    row_day = seconds // SECONDS_PER_DAY
+    found = np.searchsorted(sorted_days, row_day).clip(0, n_days - 1)
+    day_index = np.where(sorted_days[found] == row_day, order[found], -1)
+
+    minute = (seconds % SECONDS_PER_DAY) // 60
+    bucket = np.floor(minute / time_range).astype(np.int64)
+
+    keep = (spot_index >= 0) & (day_index >= 0)
+    keys = (day_index[keep] * n_buckets + bucket[keep]) * n_spots + spot_index[keep]
+    size = n_days * n_buckets * n_spots
+
+    counts = np.bincount(keys, minlength=size)
+    values = psi[keep]
+    has_value = ~np.isnan(values)
+    sums = np.bincount(keys[has_value], weights=values[has_value], minlength=size)
+    value_counts = np.bincount(keys[has_value], minlength=size)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / value_counts
+    return means.reshape(shape), counts.reshape(shape)
+
+def bucket_matrix(means, counts, day_positions):
+    """
+    Susun bucket yang berisi data (per tanggal sesuai urutan request, bucket naik)
+    jadi matriks (n_kolom, n_spot); spot tanpa data di bucket itu bernilai 0.
+    Return (matriks, list (posisi tanggal, bucket)).
+    """
+    filled = np.nan_to_num(means, nan=0.0)
+    present = counts.sum(axis=2) > 0  # (n_days, n_buckets)
+    columns = [(d, b) for d in day_positions for b in np.flatnonzero(present[d]).tolist()]
+    if not columns:
+        return np.zeros((0, means.shape[2])), columns
+    day_idx, bucket_idx = np.array(columns).T
+    return filled[day_idx, bucket_idx], columns
+
+def playback_chart(payload):
+    """Request playback (dates, timeRange, spots, rows kolom) -> output endpoint playback"""
+    dates, spots = payload.get("dates"), payload.get("spots")
+    if not isinstance(dates, list) or not dates:
+        raise PlaybackError("Dates harus berupa array dan tidak boleh kosong")
+    if not isinstance(spots, list) or not spots:
+        raise PlaybackError("Spots harus berupa array dan tidak boleh kosong")
+    time_range = parse_time_range(payload.get("timeRange"))
+    rows = payload.get("rows") or {}
+
+    date_strings = [date_only(d) for d in dates]
+    unique_dates = list(dict.fromkeys(date_strings))
+    spot_keys = list(dict.fromkeys(spot_key(s) for s in spots))
+    epoch_days = [epoch_day(d) for d in unique_dates]
+
+    if payload.get("table"):
+        # rows hanya berisi tanggal di "fetched" (hasil op history_status), sisanya dari cache disk
+        columns = spot_history.gather(
+            payload["table"], unique_dates, payload["today"], rows, payload.get("fetched") or ()
+        )
+    else:
+        columns = (rows.get("spot_id", []), rows.get("timestamp", []), rows.get("psi", []))
+    means, counts = bucket_means(*columns, epoch_days, time_range, spot_keys)
+    # Tanggal yang sama diminta dua kali tetap muncul dua kali, sama seperti loop per tanggal
+    day_positions = [unique_dates.index(d) for d in date_strings]
+    matrix, columns = bucket_matrix(means, counts, day_positions)
+
+    spot_columns = [spot_keys.index(spot_key(s)) for s in spots]
+    values = matrix[:, spot_columns].tolist()
+    categories = [f"{bucket_label(b, time_range)} | {unique_dates[d]}" for d, b in columns]
+
+    data = [
+        {
+            "timeRange": label,
+            "dateFilter": unique_dates[d],
+            "data": [{"idSpot": spot, "avgPsiValues": value} for spot, value in zip(spots, row)]
+        }
+        for label, (d, _), row in zip(categories, columns, values)
+    ]
+    series = [
+        {"idSpot": spot, "data": [row[i] for row in values]}
+        for i, spot in enumerate(spots)
+    ]
+
+    output = {"success": True, "data": data, "chartData": {"categories": categories, "series": series}}
+    if payload.get("matrix"):
+        # Baris bucket x spot (urutan spots), siap dikirim sebagai "rows" ke prediction.py
+        output["matrix"] = values
+    return output
+
+def error_output(e):
+    if isinstance(e, json.JSONDecodeError):
+        return {"success": False, "message": f"Format JSON tidak valid: {str(e)}"}
+    return {"success": False, "message": str(e)}
+
+def handle_worker_lines(lines, scheduler_stats=None):
+    """Satu batch request NDJSON -> list output (urutan sama, id dikembalikan)"""
+    outputs = []
+    for line in lines:
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            if request.get("op") == "history_status":
+                days = [date_only(d) for d in request.get("dates") or []]
+                output = {
+                    "success": True,
+                    "stale": spot_history.stale_days(request["table"], request.get("day_counts") or {},
+                                                     days, request["today"])
+                }
+            elif request.get("op") == "stats":
+                output = {"scheduler": scheduler_stats.to_dict() if scheduler_stats else None}
+            else:
+                output = playback_chart(request)
+        except Exception as e:
+            output = error_output(e)
+        output["id"] = request_id
+        outputs.append(output)
+    return outputs
+
+def main():
+    try:
+        output = playback_chart(json.loads(sys.stdin.read()))
+    except Exception as e:
+        output = error_output(e)
+    print(dumps(output))
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv[1:]:
+        from micro_batch import serve
+        serve(handle_worker_lines)
+    else:
+        main()
@@ -1,9 +1,25 @@
+import time
+SCRIPT_START = time.perf_counter()
+SCRIPT_START_NS = time.perf_counter_ns()
+
 import sys
 import json
 import pickle
-import pandas as pd
 import traceback
 import os
+import warnings
+import weakref
+from model_cache import model_cache, file_signature
+from result_cache import result_cache
+from json_output import dumps, pop_flag
+from startup_profile import StartupProfile
+from stage_timer import StageTimer, StageStats
+
+# numpy/pandas sengaja di-import di dalam fungsi yang memakainya,
+# supaya jalur error (argumen salah, model tidak ada) tidak membayar biaya import
+
+class PredictionError(Exception):
+    """Error validasi/prediksi yang dilaporkan ke pemanggil sebagai JSON status=error"""
 
 def print_error(message):
     """Print error dalam format JSON dan keluar"""
@@ -13,92 +29,214 @@ def print_error(message):
     }))
     sys.exit(1)
 
+# Level log stderr: 0 = diam, 1 = info (default), 2 = detail per request (keys, matrix, hasil mentah).
+# Log level 2 dicek dulu sebelum format string, supaya jalur default tidak memformat apa-apa.
+LOG_LEVEL = int(os.environ.get("PREDICTION_LOG_LEVEL", "1"))
+
 def debug_log(message):
     """Log debug ke stderr"""
-    print(f"Debug: {message}", file=sys.stderr)
+    if LOG_LEVEL >= 1:
+        print(f"Debug: {message}", file=sys.stderr)
 
-def validate_arguments():
-    """Validasi argumen command line"""
-    if len(sys.argv) < 6:
-        print_error("Argumen tidak lengkap. Gunakan: python predict_model.py <parameterLength> <modelName> <tline_length> <infix> <outputType> [trainingInfix]")
+def parse_arguments(args):
+    """Validasi argumen prediksi (urutan sama dengan argumen command line, tanpa nama script)"""
+    if len(args) < 5:
+        raise PredictionError("Argumen tidak lengkap. Gunakan: python predict_model.py <parameterLength> <modelName> <tline_length> <infix> <outputType> [trainingInfix]")
     
     try:
-        parameterLength = int(sys.argv[1])
-        if parameterLength <= 0:
-            print_error("parameterLength harus bilangan positif")
-    except ValueError:
-        print_error("parameterLength harus berupa integer")
+        parameterLength = int(args[0])
+    except (ValueError, TypeError):
+        raise PredictionError("parameterLength harus berupa integer")
+    if parameterLength <= 0:
+        raise PredictionError("parameterLength harus bilangan positif")
     
-    model_name = sys.argv[2]
+    model_name = str(args[1])
     model_path = os.path.join("./models", model_name)
     
     try:
-        tline_length = float(sys.argv[3])
-        if tline_length <= 0:
-            print_error("tline_length harus bilangan positif")
-    except ValueError:
-        print_error("tline_length harus berupa angka")
+        tline_length = float(args[2])
+    except (ValueError, TypeError):
+        raise PredictionError("tline_length harus berupa angka")
+    if tline_length <= 0:
+        raise PredictionError("tline_length harus bilangan positif")
     
-    infix = sys.argv[4]
+    infix = str(args[3])
     if "{x}" not in infix:
-        print_error("infix harus mengandung placeholder '{x}'")
+        raise PredictionError("infix harus mengandung placeholder '{x}'")
     
-    output_type = sys.argv[5].lower()
+    output_type = str(args[4]).lower()
     if output_type not in ["single", "multiple"]:
-        print_error("outputType harus 'single' atau 'multiple'")
+        raise PredictionError("outputType harus 'single' atau 'multiple'")
     
     # Optional: training_infix (nama kolom saat training model)
     # Jika tidak disediakan atau kosong, pakai infix yang sama
     training_infix = None
-    if len(sys.argv) > 6 and sys.argv[6].strip():
-        training_infix = sys.argv[6]
+    if len(args) > 5 and args[5] and str(args[5]).strip():
+        training_infix = str(args[5])
         if "{x}" not in training_infix:
-            print_error("trainingInfix harus mengandung placeholder '{x}'")
+            raise PredictionError("trainingInfix harus mengandung placeholder '{x}'")
     else:
         training_infix = infix  # Default: sama dengan infix
     
     return parameterLength, model_path, tline_length, infix, output_type, training_infix
 
-def load_model(model_path):
-    """Load model dari file pickle"""
+def validate_arguments():
+    """Validasi argumen command line"""
+    return parse_arguments(sys.argv[1:])
+
+# Posisi kolom per model untuk fast path numpy (dicek sekali saat load).
+# Value None = model di-fit tanpa nama kolom (posisi apa adanya).
+# Model yang tidak ada di sini tetap diberi DataFrame.
+_feature_index = weakref.WeakKeyDictionary()
+
+def set_feature_index(model, names):
+    """Simpan posisi kolom model (names None = posisi apa adanya)"""
+    if names is None:
+        _feature_index[model] = None
+    else:
+        _feature_index[model] = {str(name): i for i, name in enumerate(names)}
+        # Kolom sudah diurutkan sesuai feature_names_in_, warning nama kolom tidak relevan
+        warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning)
+
+def register_feature_index(model):
+    """Cek sekali saat load apakah model bisa diberi array float64 langsung (tanpa DataFrame)"""
+    module = type(model).__module__
+    # Hanya estimator sklearn tunggal; Pipeline/ColumnTransformer bisa butuh nama kolom DataFrame
+    if not module.startswith("sklearn.") or hasattr(model, "steps") or hasattr(model, "transformers"):
+        return
+    try:
+        set_feature_index(model, getattr(model, "feature_names_in_", None))
+    except TypeError:
+        pass  # Objek tidak bisa di-weakref, tetap lewat DataFrame
+
+def feature_columns(model, training_keys):
+    """Posisi tiap training key di matrix model, None jika harus lewat DataFrame"""
+    try:
+        if model not in _feature_index:
+            return None
+    except TypeError:
+        return None
+    index = _feature_index[model]
+    if index is None:
+        return list(range(len(training_keys)))
+    if len(index) != len(training_keys) or any(k not in index for k in training_keys):
+        return None  # Biar sklearn yang melaporkan error nama kolom lewat DataFrame
+    return [index[k] for k in training_keys]
+
+def to_model_features(model, matrix, training_keys):
+    """Matrix N x P (urutan training_keys) -> input model: array float64 atau DataFrame (fallback)"""
+    columns = feature_columns(model, training_keys)
+    if columns is None:
+        import pandas as pd
+        features = pd.DataFrame(matrix, columns=training_keys)
+        if LOG_LEVEL >= 2:
+            debug_log(f"DataFrame Input:\n{features.to_string()}")
+        return features
+    
+    if columns != list(range(len(columns))):
+        import numpy as np
+        reordered = np.empty_like(matrix)
+        reordered[:, columns] = matrix
+        matrix = reordered
+    if LOG_LEVEL >= 2:
+        debug_log(f"Array Input ({matrix.shape}):\n{matrix}")
+    return matrix
+
+# Engine pohon hasil compile per model (lihat tree_engine.py), dipakai untuk input array float64.
+# PREDICTION_TREE_ENGINE=0 untuk selalu memakai model.predict sklearn.
+TREE_ENGINE_ENABLED = os.environ.get("PREDICTION_TREE_ENGINE", "1") != "0"
+_compiled_models = weakref.WeakKeyDictionary()
+
+def register_compiled_model(model):
+    """Compile RandomForest/DecisionTree regressor ke tabel node datar saat load"""
+    if not TREE_ENGINE_ENABLED:
+        return
+    from tree_engine import compile_model
+    try:
+        compiled = compile_model(model)
+    except Exception as e:
+        debug_log(f"Compile model gagal, pakai sklearn: {str(e)}")
+        return
+    if compiled is not None:
+        _compiled_models[model] = compiled
+        debug_log(f"Model di-compile: {compiled.n_trees} pohon, depth {compiled.max_depth}")
+
+def unpickle_model(model_path):
+    """Unpickle file model"""
+    with open(model_path, 'rb') as file:
+        model = pickle.load(file)
+    register_feature_index(model)
+    register_compiled_model(model)
+    debug_log(f"Model berhasil dimuat dari {model_path}")
+    return model
+
+def load_model_file(model_path):
+    """Load model dari artifact compile (mmap, lihat model_artifact.py) jika valid, selain itu unpickle"""
+    if TREE_ENGINE_ENABLED:
+        from tree_engine import load_tree_artifact
+        model = load_tree_artifact(model_path)
+        if model is not None:
+            set_feature_index(model, model.feature_names_in_)
+            _compiled_models[model] = model.compiled
+            debug_log(f"Model berhasil dimuat dari artifact {model_path}")
+            return model
+    return unpickle_model(model_path)
+
+def load_model(model_path, timer=None):
+    """Load model dari file (lewat cache LRU, lihat model_cache.py)"""
     if not os.path.exists(model_path):
-        print_error(f"File model tidak ditemukan: {model_path}")
+        raise PredictionError(f"File model tidak ditemukan: {model_path}")
     
+    hits = model_cache.hits
     try:
-        with open(model_path, 'rb') as file:
-            model = pickle.load(file)
-        debug_log(f"Model berhasil dimuat dari {model_path}")
-        return model
+        model = model_cache.get(model_path, load_model_file)
     except Exception as e:
-        print_error(f"Gagal load model: {str(e)}")
+        raise PredictionError(f"Gagal load model: {str(e)}")
+    if timer is not None:
+        timer.count("model_cache_hits" if model_cache.hits > hits else "model_cache_misses")
+        timer.mark("load_model")
+    return model
+
+def validate_input_data(data):
+    """Pastikan input berupa object/dictionary"""
+    if not isinstance(data, dict):
+        raise PredictionError("Input JSON harus berupa object/dictionary")
+    return data
+
+def validate_batch_data(rows):
+    """Pastikan input batch berupa array tidak kosong"""
+    if not isinstance(rows, list) or len(rows) == 0:
+        raise PredictionError("Input batch harus berupa array yang tidak kosong")
+    return rows
 
 def read_input_data():
-    """Baca input JSON dari stdin"""
+    """Baca input JSON dari stdin (object = satu prediksi, array = batch)"""
     try:
         data = json.load(sys.stdin)
-        if not isinstance(data, dict):
-            print_error("Input JSON harus berupa object/dictionary")
-        return data
     except json.JSONDecodeError as e:
-        print_error(f"Format JSON tidak valid: {str(e)}")
+        raise PredictionError(f"Format JSON tidak valid: {str(e)}")
     except Exception as e:
-        print_error(f"Gagal baca input: {str(e)}")
+        raise PredictionError(f"Gagal baca input: {str(e)}")
+    if isinstance(data, list):
+        return validate_batch_data(data)
+    return validate_input_data(data)
 
-def prepare_features(data, parameterLength, infix, training_infix):
-    """Generate key dan konversi data menjadi DataFrame"""
+def feature_keys(parameterLength, infix, training_infix):
+    """Nama kolom input (dari infix user) dan nama kolom training model"""
     # Generate input keys dari infix pattern (nama kolom dari user input)
     input_keys = [infix.replace("{x}", str(i)) for i in range(1, parameterLength + 1)]
     
     # Generate training keys dari training_infix (nama kolom saat training model)
     training_keys = [training_infix.replace("{x}", str(i)) for i in range(1, parameterLength + 1)]
     
-    debug_log(f"Input keys: {input_keys}")
-    debug_log(f"Training keys: {training_keys}")
-    
+    return input_keys, training_keys
+
+def extract_inputs(data, input_keys):
+    """Validasi kelengkapan satu input dan konversi ke list float sesuai urutan input_keys"""
     # Validasi kelengkapan input
     missing = [k for k in input_keys if k not in data]
     if missing:
-        print_error(f"Input kurang lengkap, key hilang: {', '.join(missing)}")
+        raise PredictionError(f"Input kurang lengkap, key hilang: {', '.join(missing)}")
     
     # Konversi ke float dengan error handling per-key
     inputs = []
@@ -107,23 +245,95 @@ def prepare_features(data, parameterLength, infix, training_infix):
             value = float(data[k])
             inputs.append(value)
         except (ValueError, TypeError):
-            print_error(f"Nilai untuk key '{k}' harus berupa angka valid, diterima: {data[k]}")
+            raise PredictionError(f"Nilai untuk key '{k}' harus berupa angka valid, diterima: {data[k]}")
+    return inputs
+
+def prepare_features(data, parameterLength, infix, training_infix, model=None):
+    """Generate key dan konversi data menjadi input model (array float64, atau DataFrame sebagai fallback)"""
+    import numpy as np
     
-    # Buat DataFrame dengan nama kolom TRAINING (yang model expect)
-    df_input = pd.DataFrame([inputs], columns=training_keys)
-    debug_log(f"DataFrame Input:\n{df_input.to_string()}")
+    input_keys, training_keys = feature_keys(parameterLength, infix, training_infix)
     
-    return df_input, input_keys
+    if LOG_LEVEL >= 2:
+        debug_log(f"Input keys: {input_keys}")
+        debug_log(f"Training keys: {training_keys}")
+    
+    inputs = extract_inputs(data, input_keys)
+    
+    # Kolom mengikuti nama kolom TRAINING (yang model expect)
+    matrix = np.array([inputs], dtype=np.float64)
+    return to_model_features(model, matrix, training_keys), input_keys
+
+def row_format(row):
+    """Format satu baris batch: "array", "object", atau None jika bukan keduanya"""
+    if isinstance(row, (list, tuple)):
+        return "array"
+    if isinstance(row, dict):
+        return "object"
+    return None
+
+def prepare_batch_features(rows, parameterLength, infix, training_infix, model=None):
+    """Gabungkan banyak input (dict per baris atau array 2D) jadi satu matrix N x parameterLength"""
+    import numpy as np
+    
+    input_keys, training_keys = feature_keys(parameterLength, infix, training_infix)
+    
+    # Semua baris harus satu format, mengikuti baris 0
+    formats = [row_format(row) for row in rows]
+    for n, fmt in enumerate(formats):
+        if fmt is None:
+            raise PredictionError(f"Baris {n} harus berupa object atau array")
+        if fmt != formats[0]:
+            raise PredictionError(
+                f"Baris {n} berupa {fmt}, sedangkan baris 0 berupa {formats[0]}: format baris campuran tidak didukung"
+            )
+    
+    if formats[0] == "array":
+        # Array 2D: urutan kolom = 1..parameterLength
+        try:
+            matrix = np.asarray(rows, dtype=np.float64)
+        except (ValueError, TypeError):
+            raise PredictionError("Input batch harus berupa array 2D berisi angka valid")
+        if matrix.ndim != 2 or matrix.shape[1] != parameterLength:
+            raise PredictionError(f"Setiap baris batch harus berisi {parameterLength} nilai")
+    else:
+        values = []
+        for n, row in enumerate(rows):
+            missing = [k for k in input_keys if k not in row]
+            if missing:
+                raise PredictionError(f"Input baris {n} kurang lengkap, key hilang: {', '.join(missing)}")
+            try:
+                values.append([float(row[k]) for k in input_keys])
+            except (ValueError, TypeError):
+                raise PredictionError(f"Nilai pada baris {n} harus berupa angka valid")
+        matrix = np.asarray(values, dtype=np.float64)
+    
+    return to_model_features(model, matrix, training_keys), input_keys
+
+def compiled_prediction(model, features):
+    """Prediksi lewat engine compile jika tersedia, None jika harus lewat sklearn"""
+    if type(features).__name__ == "DataFrame":
+        return None
+    try:
+        compiled = _compiled_models.get(model)
+    except TypeError:
+        return None
+    if compiled is None:
+        return None
+    return compiled.predict(features)
 
-def make_prediction(model, df_input):
+def make_prediction(model, features):
     """Lakukan prediksi menggunakan model"""
     try:
-        prediksi = model.predict(df_input)
-        debug_log(f"Hasil prediksi mentah: {prediksi}")
+        prediksi = compiled_prediction(model, features)
+        if prediksi is None:
+            prediksi = model.predict(features)
+        if LOG_LEVEL >= 2:
+            debug_log(f"Hasil prediksi mentah: {prediksi}")
         return prediksi
     except Exception as e:
         debug_log(f"Error detail:\n{traceback.format_exc()}")
-        print_error(f"Error saat prediksi: {str(e)}")
+        raise PredictionError(f"Error saat prediksi: {str(e)}")
 
 def format_output(prediksi, output_type, tline_length):
     """Format hasil prediksi sesuai output_type"""
@@ -160,45 +370,444 @@ def format_output(prediksi, output_type, tline_length):
         
         return result
 
-def main():
+def run_prediction(model, data, spec, timer=None):
+    """Jalankan satu request prediksi: prepare_features -> predict -> format_output"""
+    parameterLength, model_path, tline_length, infix, output_type, training_infix = spec
+    timer = timer or StageTimer()
+    timer.count("batch_size")
+    
+    # Prepare features
+    features, input_keys = prepare_features(data, parameterLength, infix, training_infix, model)
+    timer.mark("prepare_features")
+    
+    # Prediksi
+    prediksi = make_prediction(model, features)
+    timer.mark("make_prediction")
+    
+    # Format output
+    result = format_output(prediksi, output_type, tline_length)
+    timer.mark("format_output")
+    
+    return {
+        "status": "success",
+        "result": result,
+        "spots": {k: data[k] for k in input_keys},
+        "model": model_path
+    }
+
+def run_batch_prediction(model, rows, spec, timer=None):
+    """Jalankan batch prediksi: satu matrix -> satu model.predict -> N format_output"""
+    parameterLength, model_path, tline_length, infix, output_type, training_infix = spec
+    timer = timer or StageTimer()
+    timer.count("batch_size", len(rows))
+    
+    features, input_keys = prepare_batch_features(rows, parameterLength, infix, training_infix, model)
+    timer.mark("prepare_features")
+    prediksi = make_prediction(model, features)
+    timer.mark("make_prediction")
+    
+    # Format per baris, slice [i:i+1] supaya format_output melihat bentuk yang sama dengan single request
+    results = [format_output(prediksi[i:i + 1], output_type, tline_length) for i in range(len(prediksi))]
+    timer.mark("format_output")
+    
+    return {
+        "status": "success",
+        "results": results,
+        "count": len(results),
+        "model": model_path
+    }
+
+def run_prediction_group(model, datas, spec, timer=None, memo=False):
+    """
+    Prediksi banyak request single dengan model + spec kolom yang sama dalam satu model.predict.
+    Return output per request (urutan sama dengan datas); input tidak valid mendapat error sendiri.
+    memo: pakai result_cache untuk input yang berulang (hanya worker; back-test tidak pernah hit).
+    """
+    import numpy as np
+    
+    parameterLength, model_path, tline_length, infix, output_type, training_infix = spec
+    timer = timer or StageTimer()
+    input_keys, training_keys = feature_keys(parameterLength, infix, training_infix)
+    
+    def success(i, result):
+        return {
+            "status": "success",
+            "result": result,
+            "spots": {k: datas[i][k] for k in input_keys},
+            "model": model_path
+        }
+    
+    # Input yang sama (dalam quantum) dengan file model + spec yang sama -> hasil format_output dari memo
+    signature = file_signature(model_path) if memo else None
+    outputs = [None] * len(datas)
+    valid, values, keys = [], [], []
+    for i, data in enumerate(datas):
+        try:
+            inputs = extract_inputs(data, input_keys)
+        except PredictionError as e:
+            outputs[i] = {"status": "error", "message": str(e)}
+            continue
+        key = result_cache.key(model_path, signature, inputs, spec) if memo else None
+        cached = result_cache.get(key)
+        if cached is not None:
+            outputs[i] = success(i, cached)
+            timer.count("result_cache_hits")
+            continue
+        valid.append(i)
+        values.append(inputs)
+        keys.append(key)
+    if memo:
+        timer.mark("result_cache")
+    if not valid:
+        return outputs
+    timer.count("batch_size", len(valid))
+    
+    features = to_model_features(model, np.array(values, dtype=np.float64), training_keys)
+    timer.mark("prepare_features")
+    prediksi = make_prediction(model, features)
+    timer.mark("make_prediction")
+    for n, i in enumerate(valid):
+        result = format_output(prediksi[n:n + 1], output_type, tline_length)
+        result_cache.put(keys[n], result)
+        outputs[i] = success(i, result)
+    timer.mark("format_output")
+    return outputs
+
+# Thread untuk mode compare: satu predict single-row per model (model.predict sklearn / numpy
+# sebagian besar melepas GIL, jadi beberapa model bisa jalan bersamaan)
+COMPARE_THREADS = int(os.environ.get("PREDICTION_COMPARE_THREADS", "4"))
+_compare_executor = None
+
+def compare_executor():
+    global _compare_executor
+    if _compare_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _compare_executor = ThreadPoolExecutor(max_workers=max(1, COMPARE_THREADS), thread_name_prefix="compare")
+    return _compare_executor
+
+def comparison_input(spec, data, delta):
+    """Input untuk satu model: data apa adanya, atau delta (urutan parameter 1..n) dipetakan ke infix model"""
+    if delta is None:
+        return data
+    parameterLength, infix = spec[0], spec[3]
+    if len(delta) < parameterLength:
+        raise PredictionError(f"Delta berisi {len(delta)} nilai, model butuh {parameterLength}")
+    return {infix.replace("{x}", str(i)): delta[i - 1] for i in range(1, parameterLength + 1)}
+
+def score_for_comparison(model, spec, data, delta):
+    """Satu model pada input pembanding, return (output, nilai prediksi mentah per titik)"""
+    import numpy as np
+    
+    parameterLength, model_path, tline_length, infix, output_type, training_infix = spec
+    input_data = comparison_input(spec, data, delta)
+    features, input_keys = prepare_features(input_data, parameterLength, infix, training_infix, model)
+    prediksi = make_prediction(model, features)
+    output = {
+        "status": "success",
+        "result": format_output(prediksi, output_type, tline_length),
+        "spots": {k: input_data[k] for k in input_keys},
+        "model": model_path
+    }
+    return output, np.ravel(np.asarray(prediksi, dtype=np.float64)[0]).tolist()
+
+def comparison_agreement(scored):
+    """
+    Statistik kesepakatan antar model yang sukses, per titik (model single = satu titik).
+    scored: list (output, nilai mentah, tline_length).
+    """
+    import numpy as np
+    
+    if not scored:
+        return {"models": 0, "points": []}
+    n_points = min(len(raw) for _, raw, _ in scored)
+    points = []
+    for i in range(n_points):
+        values = np.array([raw[i] for _, raw, _ in scored])
+        tlines = np.array([tline for _, _, tline in scored])
+        leak = (values > 0) & (values < tlines)
+        leak_votes = int(leak.sum())
+        majority = "kebocoran" if leak_votes * 2 > len(scored) else "aman"
+        agreeing = leak_votes if majority == "kebocoran" else len(scored) - leak_votes
+        point = {
+            "titik": i + 1,
+            "status": majority,
+            "status_agreement": agreeing / len(scored),
+            "leak_votes": leak_votes,
+            "location": None
+        }
+        if leak_votes:
+            locations = values[leak]
+            point["location"] = {
+                "mean": float(locations.mean()),
+                "min": float(locations.min()),
+                "max": float(locations.max()),
+                "spread": float(locations.max() - locations.min()),
+                "std": float(locations.std())
+            }
+        points.append(point)
+    return {
+        "models": len(scored),
+        "status_agreement": min(point["status_agreement"] for point in points) if points else None,
+        "points": points
+    }
+
+def run_model_comparison(model_args, data=None, delta=None):
+    """
+    Satu input ke banyak model (list argumen seperti command line, tanpa nama script).
+    Model di-load lewat cache, predict single-row per model dijalankan di thread pool.
+    Return hasil per model (urutan sama dengan model_args) dan statistik kesepakatan.
+    """
+    if not isinstance(model_args, list) or not model_args:
+        raise PredictionError("models harus berupa array argumen model yang tidak kosong")
+    if delta is None:
+        validate_input_data(data)
+    elif not isinstance(delta, list):
+        raise PredictionError("delta harus berupa array")
+    
+    outputs = [None] * len(model_args)
+    jobs = []  # (posisi, spec, model)
+    for pos, args in enumerate(model_args):
+        try:
+            spec = parse_arguments(args if isinstance(args, list) else [])
+            jobs.append((pos, spec, load_model(spec[1])))
+        except PredictionError as e:
+            outputs[pos] = {"status": "error", "message": str(e)}
+    
+    def score(job):
+        pos, spec, model = job
+        try:
+            return pos, spec, score_for_comparison(model, spec, data, delta)
+        except PredictionError as e:
+            return pos, spec, ({"status": "error", "model": spec[1], "message": str(e)}, None)
+    
+    if len(jobs) > 1:
+        scored_jobs = list(compare_executor().map(score, jobs))
+    else:
+        scored_jobs = [score(job) for job in jobs]
+    
+    scored = []
+    for pos, spec, (output, raw) in scored_jobs:
+        outputs[pos] = output
+        if raw is not None:
+            scored.append((output, raw, spec[2]))
+    
+    return {
+        "status": "success",
+        "count": len(outputs),
+        "results": outputs,
+        "agreement": comparison_agreement(scored)
+    }
+
+def parse_worker_request(line):
+    """Decode satu baris request NDJSON"""
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise PredictionError(f"Format JSON tidak valid: {str(e)}")
+    if not isinstance(request, dict):
+        raise PredictionError("Request worker harus berupa object/dictionary")
+    return request
+
+# Histogram timing per stage semua request worker (op "stats")
+stage_stats = StageStats()
+
+def handle_worker_lines(lines, scheduler_stats=None):
+    """
+    Proses request yang tiba dalam satu window scheduler. Format per baris:
+    {"id", "args", "data"} (single), {"id", "args", "rows"} (batch), {"id", "op": "stats"}
+    atau {"id", "op": "compare", "models": [args, ...], "delta" | "data"} (lihat run_model_comparison).
+    Request single dikelompokkan per model + spec kolom dan diprediksi dalam satu micro-batch;
+    input yang masih ada di result_cache tidak diprediksi ulang.
+    "timings": true di request menambahkan timing per stage (untuk micro-batch: timing batch itu).
+    Return output per baris dengan urutan yang sama.
+    """
+    outputs = [None] * len(lines)
+    groups = {}  # spec -> [(posisi, id, data, timings, ns parse)]
+    stats_requests = []  # dijawab paling akhir, setelah semua prediksi di putaran ini
+    
+    for pos, line in enumerate(lines):
+        request_id = None
+        try:
+            parse_start = time.perf_counter_ns()
+            request = parse_worker_request(line)
+            parse_ns = time.perf_counter_ns() - parse_start
+            request_id = request.get("id")
+            if request.get("op") == "stats":
+                stats_requests.append((pos, request_id))
+                continue
+            if request.get("op") == "compare":
+                output = run_model_comparison(request.get("models"), request.get("data"), request.get("delta"))
+                output["id"] = request_id
+                outputs[pos] = output
+                continue
+            spec = parse_arguments(request.get("args") or [])
+            if LOG_LEVEL >= 2:
+                debug_log(f"Worker request {request_id}: {spec}")
+            if "rows" in request:
+                timer = StageTimer()
+                timer.add("read_input_data", parse_ns)
+                rows = validate_batch_data(request.get("rows"))
+                output = run_batch_prediction(load_model(spec[1], timer), rows, spec, timer)
+                stage_stats.record(timer)
+                if request.get("timings"):
+                    output["timings"] = timer.to_dict()
+            else:
+                data = validate_input_data(request.get("data"))
+                groups.setdefault(spec, []).append((pos, request_id, data, bool(request.get("timings")), parse_ns))
+                continue
+        except PredictionError as e:
+            output = {"status": "error", "message": str(e)}
+        except Exception as e:
+            debug_log(f"Fatal error:\n{traceback.format_exc()}")
+            output = {"status": "error", "message": f"Terjadi kesalahan fatal: {str(e)}"}
+        output["id"] = request_id
+        outputs[pos] = output
+    
+    for spec, items in groups.items():
+        timer = StageTimer()
+        timer.add("read_input_data", sum(item[4] for item in items))
+        try:
+            model = load_model(spec[1], timer)
+            results = run_prediction_group(model, [item[2] for item in items], spec, timer, memo=True)
+            stage_stats.record(timer)
+        except PredictionError as e:
+            results = [{"status": "error", "message": str(e)} for _ in items]
+        except Exception as e:
+            debug_log(f"Fatal error:\n{traceback.format_exc()}")
+            results = [{"status": "error", "message": f"Terjadi kesalahan fatal: {str(e)}"} for _ in items]
+        timings = timer.to_dict()
+        for (pos, request_id, _, wants_timings, _), output in zip(items, results):
+            if wants_timings:
+                output["timings"] = timings
+            output["id"] = request_id
+            outputs[pos] = output
+    
+    for pos, request_id in stats_requests:
+        outputs[pos] = {
+            "status": "success",
+            "model_cache": model_cache.stats(),
+            "result_cache": result_cache.stats(),
+            "scheduler": scheduler_stats.to_dict() if scheduler_stats else None,
+            "stages": stage_stats.to_dict(),
+            "id": request_id
+        }
+    
+    return outputs
+
+def worker_main():
+    """Mode worker: baca request NDJSON dari stdin, tulis satu baris response per request"""
+    from micro_batch import serve
+    debug_log("Worker siap menerima request")
+    serve(handle_worker_lines)
+
+def compile_main(model_name):
+    """Mode --compile: tulis artifact tabel node di samping file model (dijalankan sekali setelah upload)"""
+    model_path = os.path.join("./models", model_name)
+    try:
+        if not os.path.exists(model_path):
+            raise PredictionError(f"File model tidak ditemukan: {model_path}")
+        from tree_engine import compile_model, save_tree_artifact
+        
+        with open(model_path, 'rb') as file:
+            model = pickle.load(file)
+        compiled = compile_model(model)
+        if compiled is None:
+            print(dumps({
+                "status": "skipped",
+                "message": f"Tipe model {type(model).__name__} tidak didukung compile, tetap pakai pickle"
+            }))
+            sys.exit(0)
+        
+        target = save_tree_artifact(model_path, model, compiled)
+        print(dumps({"status": "success", "artifact": target, "trees": compiled.n_trees}))
+        sys.exit(0)
+    except SystemExit:
+        raise
+    except PredictionError as e:
+        print_error(str(e))
+    except Exception as e:
+        debug_log(f"Fatal error:\n{traceback.format_exc()}")
+        print_error(f"Gagal compile model: {str(e)}")
+
+def compare_main(pretty=False):
+    """Mode --compare: stdin {"models": [args, ...], "delta": [...]} atau {"models", "data": {...}}"""
+    try:
+        try:
+            request = json.load(sys.stdin)
+        except json.JSONDecodeError as e:
+            raise PredictionError(f"Format JSON tidak valid: {str(e)}")
+        validate_input_data(request)
+        output = run_model_comparison(request.get("models"), request.get("data"), request.get("delta"))
+        print(dumps(output, pretty=pretty))
+        sys.exit(0)
+    except SystemExit:
+        raise
+    except PredictionError as e:
+        print_error(str(e))
+    except Exception as e:
+        debug_log(f"Fatal error:\n{traceback.format_exc()}")
+        print_error(f"Terjadi kesalahan fatal: {str(e)}")
+
+def main(pretty=False, profile=None, timings=False):
+    profile = profile or StartupProfile(SCRIPT_START, enabled=False)
+    # "start" = import modul dan parse argumen sejak baris pertama script
+    timer = StageTimer(SCRIPT_START_NS)
     try:
         # Validasi dan parse argumen
-        parameterLength, model_path, tline_length, infix, output_type, training_infix = validate_arguments()
+        spec = validate_arguments()
+        parameterLength, model_path, tline_length, infix, output_type, training_infix = spec
         debug_log(f"Params: length={parameterLength}, tline={tline_length}, infix={infix}, training_infix={training_infix}, output={output_type}")
+        profile.mark("arguments")
+        timer.mark("start")
         
         # Load model
-        model = load_model(model_path)
+        model = load_model(model_path, timer)
+        profile.mark("model_load")
         
         # Baca input data
         data = read_input_data()
-        debug_log(f"Input data: {json.dumps(data, indent=2)}")
-        
-        # Prepare features
-        df_input, input_keys = prepare_features(data, parameterLength, infix, training_infix)
-        
-        # Prediksi
-        prediksi = make_prediction(model, df_input)
+        profile.mark("read_input")
+        timer.mark("read_input_data")
         
-        # Format output
-        result = format_output(prediksi, output_type, tline_length)
-        
-        # Return hasil JSON
-        output = {
-            "status": "success",
-            "result": result,
-            "spots": {k: data[k] for k in input_keys},
-            "model": model_path
-        }
+        if isinstance(data, list):
+            output = run_batch_prediction(model, data, spec, timer)
+        else:
+            if LOG_LEVEL >= 2:
+                debug_log(f"Input data: {json.dumps(data, indent=2)}")
+            output = run_prediction(model, data, spec, timer)
+        profile.mark("predict")
+        if timings:
+            output["timings"] = timer.to_dict()
         
-        print(json.dumps(output, indent=2))
+        print(dumps(output, pretty=pretty))
+        profile.mark("output")
         sys.exit(0)
         
     except SystemExit:
         # Biarkan SystemExit dari print_error() lewat
         raise
+    except PredictionError as e:
+        print_error(str(e))
     except Exception as e:
         debug_log(f"Fatal error:\n{traceback.format_exc()}")
         print_error(f"Terjadi kesalahan fatal: {str(e)}")
+    finally:
+        profile.report()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # --pretty: output JSON ber-indent (untuk debug manual), default satu baris
+    pretty = pop_flag(sys.argv, "--pretty")
+    # --startup-profile: tulis durasi import / load model / predict ke stderr
+    profile = StartupProfile(SCRIPT_START, enabled=pop_flag(sys.argv, "--startup-profile"))
+    # --timings: tambahkan field "timings" (durasi per stage + counter) ke output
+    timings = pop_flag(sys.argv, "--timings")
+    if pop_flag(sys.argv, "--worker"):
+        worker_main()
+    elif pop_flag(sys.argv, "--compare"):
+        compare_main(pretty)
+    elif pop_flag(sys.argv, "--compile"):
+        if len(sys.argv) < 2:
+            print_error("Gunakan: python prediction.py --compile <modelName>")
+        compile_main(sys.argv[1])
+    else:
+        main(pretty, profile, timings)
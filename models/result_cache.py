@@ -0,0 +1,138 @@
+"""
+Memo hasil prediksi untuk input yang berulang: dashboard yang polling trunkline yang sama
+mengirim delta / snapshot yang sama berkali-kali dalam beberapa detik.
+
+Key = (path model, signature file model, bagian spec, input terkuantisasi). Input dibulatkan
+ke kelipatan quantum sebelum jadi key, jadi selisih float di bawah quantum tetap hit.
+Entry kedaluwarsa setelah ttl detik dan dibuang LRU saat melebihi max_entries.
+Jika signature file model berubah (model di-upload ulang), semua entry model itu dibuang.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Budget default, bisa di-override lewat environment (max entries / TTL 0 = memo mati)
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "4096"))
+DEFAULT_TTL = float(os.environ.get("RESULT_CACHE_TTL", "30"))
+DEFAULT_QUANTUM = float(os.environ.get("RESULT_CACHE_QUANTUM", "1e-6"))
+
+def quantize(values, quantum=DEFAULT_QUANTUM):
+    """Input -> tuple int (kelipatan quantum); None jika ada nilai NaN / inf (tidak di-memo)"""
+    quantized = []
+    for value in values:
+        value = float(value)
+        if not math.isfinite(value):
+            return None
+        quantized.append(round(value / quantum))
+    return tuple(quantized)
+
+class ResultCache:
+    """
+    Cache LRU + TTL untuk hasil prediksi per input.
+    Nilai yang disimpan dipakai bersama oleh semua hit, jadi pemanggil tidak boleh mengubahnya.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, quantum=DEFAULT_QUANTUM,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.quantum = quantum
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (waktu kedaluwarsa, hasil)
+        self._signatures = {}  # path model -> signature file terakhir yang dilihat
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.ttl > 0
+
+    def key(self, model_path, signature, values, *parts):
+        """Key satu input; None jika memo mati atau input tidak bisa di-memo"""
+        if not self.enabled:
+            return None
+        quantized = quantize(values, self.quantum)
+        if quantized is None:
+            return None
+        return os.path.abspath(model_path), signature, parts, quantized
+
+    def get(self, key):
+        """Hasil yang masih berlaku untuk key, atau None"""
+        if key is None:
+            return None
+        with self._lock:
+            self._check_signature(key[0], key[1])
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if key is None:
+            return
+        with self._lock:
+            self._check_signature(key[0], key[1])
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _check_signature(self, path, signature):
+        """File model diganti -> buang semua hasil dari model lama"""
+        previous = self._signatures.get(path)
+        if previous == signature:
+            return
+        if previous is not None:
+            self._drop(path)
+        self._signatures[path] = signature
+
+    def _drop(self, path):
+        stale = [key for key in self._entries if key[0] == path]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def invalidate(self, model_path=None):
+        """Hapus hasil satu model (atau semua jika model_path None)"""
+        with self._lock:
+            if model_path is None:
+                self._entries.clear()
+                self._signatures.clear()
+                return
+            path = os.path.abspath(model_path)
+            self._drop(path)
+            self._signatures.pop(path, None)
+
+    def stats(self):
+        """Counter memo untuk monitoring (hit_ratio dari semua lookup yang bisa di-memo)"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "quantum": self.quantum,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0
+            }
+
+# Instance bersama untuk satu proses
+result_cache = ResultCache()
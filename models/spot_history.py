@@ -0,0 +1,144 @@
+"""
+Cache kolom histori psi per spot di disk: satu directory per (tabel data, tanggal)
+berisi spot_id.npy, seconds.npy (uint32, detik sejak 1970-01-01 dari DATETIME apa adanya)
+dan psi.npy (float64, sama dengan nilai dari MySQL), diurutkan per spot lalu waktu, plus manifest.json.
+Array di-load dengan mmap read-only, jadi playback / back-test berbulan-bulan tidak
+perlu query ke MySQL lagi.
+
+Hanya hari yang sudah lewat yang disimpan; hari ini (dan seterusnya) selalu dibaca dari
+MySQL. Tiap hari menyimpan jumlah baris di database saat di-cache; jika jumlah baris
+sekarang berbeda (ada baris yang datang terlambat / dihapus), hari itu dianggap basi
+dan diambil ulang.
+"""
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+# Versi 2: psi float64 (versi 1 float32 dianggap basi dan diambil ulang)
+HISTORY_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+HISTORY_COLUMNS = ("spot_id", "seconds", "psi")
+HISTORY_DIR = os.environ.get("SPOT_HISTORY_DIR", os.path.join("cache", "spot_history"))
+
+TABLE_PATTERN = re.compile(r"^[A-Za-z0-9_]+$")
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+def day_path(table, day):
+    """Directory cache satu tanggal ('YYYY-MM-DD') dari satu tabel data"""
+    if not TABLE_PATTERN.match(str(table)):
+        raise ValueError(f"Nama tabel tidak valid: {table}")
+    if not DATE_PATTERN.match(str(day)):
+        raise ValueError(f"Format tanggal tidak valid: {day}")
+    return os.path.join(HISTORY_DIR, table, day)
+
+def read_manifest(table, day):
+    try:
+        with open(os.path.join(day_path(table, day), MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("format_version") == HISTORY_VERSION else None
+    except (OSError, ValueError):
+        return None
+
+def stale_days(table, day_counts, days, today):
+    """
+    Tanggal yang harus dibaca dari MySQL: hari ini / setelahnya, belum di-cache,
+    atau jumlah barisnya di database (day_counts, tanggal tanpa baris = 0) sudah berubah.
+    """
+    stale = []
+    for day in dict.fromkeys(days):
+        if day >= today:
+            stale.append(day)
+            continue
+        manifest = read_manifest(table, day)
+        if manifest is None or manifest["rows"] != int(day_counts.get(day, 0)):
+            stale.append(day)
+    return stale
+
+def store_day(table, day, spot_ids, seconds, psi):
+    """Tulis satu hari (semua spot) ke cache, ganti isi lama secara atomik"""
+    target = day_path(table, day)
+    spot_ids = np.asarray(spot_ids)
+    seconds = np.asarray(seconds, dtype=np.int64)
+    psi = np.asarray(psi, dtype=np.float64)
+
+    order = np.lexsort((seconds, spot_ids))
+    arrays = {
+        "spot_id": spot_ids[order],
+        "seconds": seconds[order].astype(np.uint32),
+        "psi": psi[order]
+    }
+
+    tmp = f"{target}.tmp{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+    with open(os.path.join(tmp, MANIFEST_NAME), "w") as f:
+        json.dump({"format_version": HISTORY_VERSION, "rows": len(order)}, f)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(tmp, target)
+
+def load_day(table, day):
+    """Kolom satu hari dari cache (di-mmap), None jika tidak ada"""
+    if read_manifest(table, day) is None:
+        return None
+    target = day_path(table, day)
+    try:
+        return {
+            name: np.load(os.path.join(target, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+            for name in HISTORY_COLUMNS
+        }
+    except (OSError, ValueError):
+        return None
+
+def split_days(spot_ids, seconds, psi):
+    """Baris campuran beberapa tanggal -> {tanggal: (spot_id, seconds, psi)}"""
+    seconds = np.asarray(seconds, dtype=np.int64)
+    if len(seconds) == 0:
+        return {}
+    spot_ids, psi = np.asarray(spot_ids), np.asarray(psi, dtype=np.float64)
+    epoch_days = seconds // 86400
+    days = {}
+    for epoch_day in np.unique(epoch_days).tolist():
+        mask = epoch_days == epoch_day
+        day = str(np.datetime64(epoch_day, "D"))
+        days[day] = (spot_ids[mask], seconds[mask], psi[mask])
+    return days
+
+def gather(table, days, today, fresh=None, fetched=()):
+    """
+    Kolom (spot_id, seconds, psi) untuk tanggal-tanggal yang diminta.
+
+    fresh: baris dari MySQL untuk tanggal di fetched (tanggal basi dari stale_days, semua spot).
+    Hari yang sudah lewat dari fetched disimpan ke cache dulu (hari tanpa baris juga,
+    supaya tidak di-query lagi), tanggal lain dibaca dari cache.
+    """
+    fresh = fresh or {}
+    fetched = set(fetched)
+    fresh_days = split_days(fresh.get("spot_id", []), fresh.get("timestamp", []), fresh.get("psi", []))
+
+    parts = []
+    for day in dict.fromkeys(days):
+        if day in fetched:
+            columns = fresh_days.get(day)
+            if day < today:
+                store_day(table, day, *(columns or ((), (), ())))
+            if columns is not None:
+                parts.append(columns)
+            continue
+        cached = load_day(table, day)
+        if cached is None:
+            raise ValueError(f"Histori {day} tidak ada di cache, cek ulang tanggal yang basi")
+        if len(cached["seconds"]):
+            parts.append(tuple(cached[name] for name in HISTORY_COLUMNS))
+
+    if not parts:
+        return np.array([]), np.array([], dtype=np.int64), np.array([])
+    spot_ids = np.concatenate([np.asarray(p[0]) for p in parts])
+    seconds = np.concatenate([np.asarray(p[1], dtype=np.int64) for p in parts])
+    psi = np.concatenate([np.asarray(p[2], dtype=np.float64) for p in parts])
+    return spot_ids, seconds, psi
@@ -0,0 +1,73 @@
+"""
+Timing per stage pipeline prediksi (clock monotonic time.perf_counter_ns).
+
+StageTimer mencatat durasi tiap stage dari satu request (atau satu micro-batch),
+plus counter seperti cache hit dan ukuran batch; hasilnya bisa dikirim di field
+"timings" response. StageStats mengumpulkan banyak StageTimer jadi histogram
+per stage untuk op "stats" di mode --worker.
+"""
+import time
+
+from micro_batch import Histogram, COUNT_BUCKETS, MS_BUCKETS
+
+# Urutan stage pipeline prediction.py
+STAGES = ("start", "load_model", "read_input_data", "result_cache", "prepare_features", "make_prediction",
+          "format_output")
+
+class StageTimer:
+    """Durasi per stage sejak mark() sebelumnya (atau sejak start_ns)"""
+
+    def __init__(self, start_ns=None):
+        self.start_ns = time.perf_counter_ns() if start_ns is None else start_ns
+        self.last_ns = self.start_ns
+        self.stages = {}
+        self.counters = {}
+
+    def mark(self, stage):
+        """Tutup stage yang sedang berjalan; stage yang sama dijumlahkan"""
+        now = time.perf_counter_ns()
+        self.stages[stage] = self.stages.get(stage, 0) + now - self.last_ns
+        self.last_ns = now
+
+    def add(self, stage, ns):
+        """Tambah durasi yang diukur di luar timer ini (mis. parse per baris di worker)"""
+        self.stages[stage] = self.stages.get(stage, 0) + ns
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        stages = {stage: round(ns / 1e6, 3) for stage, ns in self.stages.items()}
+        return {
+            "stages_ms": stages,
+            "total_ms": round(sum(self.stages.values()) / 1e6, 3),
+            "counters": dict(self.counters)
+        }
+
+class StageStats:
+    """Histogram durasi per stage dan total counter selama umur proses worker"""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.batch_size = Histogram(COUNT_BUCKETS)
+
+    def record(self, timer):
+        for stage, ns in timer.stages.items():
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(MS_BUCKETS)
+            histogram.add(ns / 1e6)
+        for name, value in timer.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        if "batch_size" in timer.counters:
+            self.batch_size.add(timer.counters["batch_size"])
+
+    def to_dict(self):
+        ordered = [stage for stage in STAGES if stage in self.stages]
+        ordered += [stage for stage in self.stages if stage not in STAGES]
+        return {
+            "stages_ms": {stage: self.stages[stage].to_dict() for stage in ordered},
+            "counters": dict(self.counters),
+            "batch_size": self.batch_size.to_dict()
+        }
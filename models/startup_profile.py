@@ -0,0 +1,56 @@
+import builtins
+import json
+import sys
+import time
+
+class StartupProfile:
+    """
+    Profil cold start untuk --startup-profile.
+    Waktu import (termasuk import yang dipicu unpickle) dipisah dari waktu
+    fase lain, lalu ditulis sebagai satu baris JSON ke stderr.
+    """
+
+    def __init__(self, script_start, enabled=True):
+        self.enabled = enabled
+        if not enabled:
+            return
+        self.script_start = script_start
+        self.last = time.perf_counter()
+        # Semua yang terjadi sebelum profil dibuat adalah import level modul
+        self.phases = {"imports": (self.last - script_start) * 1000}
+        self._phase_import_ms = 0.0
+        self._depth = 0
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def _timed_import(self, *args, **kwargs):
+        # Hanya import terluar yang dihitung, import bersarang sudah termasuk di dalamnya
+        if self._depth:
+            return self._original_import(*args, **kwargs)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            return self._original_import(*args, **kwargs)
+        finally:
+            self._depth -= 1
+            self._phase_import_ms += (time.perf_counter() - start) * 1000
+
+    def mark(self, phase):
+        """Tutup fase yang sedang berjalan (durasi tanpa waktu import di dalamnya)"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        wall = (now - self.last) * 1000
+        self.phases[phase] = self.phases.get(phase, 0.0) + wall - self._phase_import_ms
+        self.phases["imports"] += self._phase_import_ms
+        self._phase_import_ms = 0.0
+        self.last = now
+
+    def report(self):
+        """Tulis hasil profil ke stderr dan lepas hook import"""
+        if not self.enabled:
+            return
+        builtins.__import__ = self._original_import
+        result = {k: round(v, 3) for k, v in self.phases.items()}
+        result["total"] = round((time.perf_counter() - self.script_start) * 1000, 3)
+        print(json.dumps({"startup_profile_ms": result}), file=sys.stderr)
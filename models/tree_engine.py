@@ -0,0 +1,170 @@
+import os
+import pickle
+
+import numpy as np
+
+from model_artifact import save_artifact, load_artifact
+
+TREE_ARTIFACT_KIND = "tree_ensemble"
+TREE_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+# Estimator yang bisa di-compile (regressor berbasis pohon sklearn)
+TREE_TYPES = {"DecisionTreeRegressor", "ExtraTreeRegressor"}
+FOREST_TYPES = {"RandomForestRegressor", "ExtraTreesRegressor"}
+
+# Di atas jumlah baris ini sklearn lebih cepat (diukur: RF 379 pohon depth 8 impas di ~700 baris,
+# satu pohon di ~2000 baris), jadi batch besar seperti back-test tetap lewat model.predict
+ENGINE_MAX_ROWS = int(os.environ.get("PREDICTION_TREE_ENGINE_MAX_ROWS", "512"))
+
+class CompiledTreeEnsemble:
+    """
+    Semua pohon dalam satu tabel node datar (feature, threshold, left, right, value).
+    Leaf menunjuk ke dirinya sendiri, jadi semua pohon bisa ditelusuri bersamaan
+    sebanyak max_depth langkah tanpa percabangan per pohon.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, n_features, single_output):
+        self.feature = feature          # (n_nodes,) int
+        self.threshold = threshold      # (n_nodes,) float64
+        self.left = left                # (n_nodes,) index global node kiri
+        self.right = right              # (n_nodes,) index global node kanan
+        self.value = value              # (n_nodes, n_outputs) float64
+        self.roots = roots              # (n_trees,) index root tiap pohon
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.single_output = bool(single_output)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def to_arrays(self):
+        """Array tabel node + metadata untuk artifact"""
+        arrays = {name: getattr(self, name) for name in TREE_ARRAYS}
+        meta = {"max_depth": self.max_depth, "n_features": self.n_features, "single_output": self.single_output}
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        return cls(
+            max_depth=meta["max_depth"], n_features=meta["n_features"], single_output=meta["single_output"],
+            **{name: arrays[name] for name in TREE_ARRAYS}
+        )
+
+    def predict(self, X):
+        """
+        Prediksi 1..N baris, hasil sama persis dengan model.predict sklearn.
+        Return None jika input harus ditangani sklearn (NaN/inf, jumlah kolom salah,
+        lebih dari ENGINE_MAX_ROWS baris).
+        """
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features or X.shape[0] > ENGINE_MAX_ROWS:
+            return None
+        # sklearn mengubah input pohon ke float32 sebelum dibandingkan dengan threshold
+        X = X.astype(np.float32)
+        if not np.isfinite(X).all():
+            return None
+
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)
+        node = np.repeat(self.roots[:, None], n_rows, axis=1)  # (n_trees, n_rows)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+
+        leaf_values = self.value[node]  # (n_trees, n_rows, n_outputs)
+        if self.n_trees == 1:
+            y = leaf_values[0]
+        else:
+            # Urutan penjumlahan sama dengan RandomForest (akumulasi per estimator lalu dibagi)
+            y = np.zeros(leaf_values.shape[1:])
+            for tree_values in leaf_values:
+                y += tree_values
+            y /= self.n_trees
+
+        return y[:, 0] if self.single_output else y
+
+def compile_model(model):
+    """Compile estimator pohon sklearn ke CompiledTreeEnsemble, None jika tipe tidak didukung"""
+    name = type(model).__name__
+    if name in TREE_TYPES:
+        trees = [model.tree_]
+    elif name in FOREST_TYPES:
+        trees = [estimator.tree_ for estimator in model.estimators_]
+    else:
+        return None
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        n_nodes = tree.node_count
+        left = tree.children_left[:n_nodes].astype(np.int64)
+        right = tree.children_right[:n_nodes].astype(np.int64)
+        is_leaf = left == -1
+        own_index = np.arange(n_nodes)
+
+        features.append(np.where(is_leaf, 0, tree.feature[:n_nodes]))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold[:n_nodes]))
+        lefts.append(np.where(is_leaf, own_index, left) + offset)
+        rights.append(np.where(is_leaf, own_index, right) + offset)
+        values.append(tree.value[:n_nodes, :, 0])
+        roots.append(offset)
+
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n_nodes
+
+    return CompiledTreeEnsemble(
+        feature=np.concatenate(features).astype(np.intp),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.intp),
+        right=np.concatenate(rights).astype(np.intp),
+        value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+        roots=np.asarray(roots, dtype=np.intp),
+        max_depth=max_depth,
+        n_features=model.n_features_in_,
+        single_output=model.n_outputs_ == 1
+    )
+
+class ArtifactTreeModel:
+    """
+    Model yang di-load dari artifact compile (tanpa unpickle).
+    Estimator sklearn asli baru di-unpickle jika engine tidak bisa menangani input
+    (DataFrame fallback, NaN/inf, batch besar), supaya error dan perilakunya tetap dari sklearn.
+    """
+
+    def __init__(self, compiled, feature_names, model_path):
+        self.compiled = compiled
+        self.feature_names_in_ = feature_names
+        self.n_features_in_ = compiled.n_features
+        self.model_path = model_path
+        self._estimator = None
+
+    def estimator(self):
+        if self._estimator is None:
+            with open(self.model_path, "rb") as f:
+                self._estimator = pickle.load(f)
+        return self._estimator
+
+    def predict(self, X):
+        if type(X).__name__ != "DataFrame":
+            y = self.compiled.predict(X)
+            if y is not None:
+                return y
+        return self.estimator().predict(X)
+
+def save_tree_artifact(model_path, model, compiled):
+    """Tulis artifact tabel node untuk file model"""
+    arrays, meta = compiled.to_arrays()
+    names = getattr(model, "feature_names_in_", None)
+    meta["feature_names"] = None if names is None else [str(name) for name in names]
+    meta["estimator"] = type(model).__name__
+    return save_artifact(model_path, TREE_ARTIFACT_KIND, arrays, meta)
+
+def load_tree_artifact(model_path):
+    """ArtifactTreeModel dari artifact yang masih valid, None jika tidak ada"""
+    loaded = load_artifact(model_path, TREE_ARTIFACT_KIND)
+    if loaded is None:
+        return None
+    arrays, meta = loaded
+    return ArtifactTreeModel(CompiledTreeEnsemble.from_arrays(arrays, meta), meta["feature_names"], model_path)
@@ -98,6 +98,18 @@ router.post(
   pipeController().executePrediction
 );
 
+router.post(
+  "/api/v1/pipe/analysis/prediction/execute/batch",
+  verifyRequest,
+  pipeController().executePredictionBatch
+);
+
+router.post(
+  "/api/v1/pipe/analysis/prediction/compare",
+  verifyRequest,
+  pipeController().compareModels
+);
+
 router.post(
   "/api/proxy/v1/pipe/analysis/prediction/jmr",
   pipeController().jmrProxy
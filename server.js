@@ -41,6 +41,7 @@ async function bootstrap() {
 
   //Register socket namespaces
   registry.register("wsns:chat", io.of("/chat"));
+  registry.register("wsns:jmr", io.of("/jmr"));
   logger.info("Bootstrap: Loading listeners...");
   await loadListeners();
   logger.info("Bootstrap: All services ready.");
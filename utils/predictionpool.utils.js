@@ -0,0 +1,185 @@
+import { spawn } from "child_process";
+import readline from "readline";
+import emitter from "./eventBus.js";
+
+// Selisih antrian maksimum sebelum request pindah dari worker afinitasnya
+const AFFINITY_MAX_EXTRA_PENDING = 8;
+
+// Batas waktu satu request ke worker sebelum ditolak (ms)
+const REQUEST_TIMEOUT_MS = parseInt(
+  process.env.WORKER_REQUEST_TIMEOUT_MS || "60000",
+  10
+);
+
+// id dari baris output yang gagal di-parse (worker menulis "id" di akhir object)
+const recoverId = (line) => {
+  const match = line.match(/"id":\s*(\d+)\s*}\s*$/);
+  return match ? Number(match[1]) : undefined;
+};
+
+// Hash string sederhana (FNV-1a) untuk afinitas model -> worker
+const hashKey = (key) => {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < key.length; i++) {
+    hash ^= key.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193);
+  }
+  return hash >>> 0;
+};
+
+// Pool worker python yang hidup terus (mode --worker), request/response NDJSON
+class PythonWorkerPool {
+  constructor(
+    script,
+    {
+      size = 2,
+      args = ["--worker"],
+      name = script,
+      timeoutMs = REQUEST_TIMEOUT_MS,
+    } = {}
+  ) {
+    this.script = script;
+    this.args = args;
+    this.size = Math.max(1, size);
+    this.name = name;
+    this.timeoutMs = timeoutMs;
+    this.workers = new Array(this.size).fill(null); // slot tetap, supaya afinitas stabil
+    this.nextId = 1;
+    this.closed = false;
+  }
+
+  spawnWorker(slot) {
+    const proc = spawn("python3", [this.script, ...this.args]);
+    const worker = { proc, pending: new Map() };
+
+    readline.createInterface({ input: proc.stdout }).on("line", (line) => {
+      if (!line.trim()) return;
+      let response;
+      try {
+        response = JSON.parse(line);
+      } catch (e) {
+        console.error(`[${this.name}] Output worker tidak valid: ${line}`);
+        // Tolak job pemilik baris ini; kalau id tidak terbaca, semua job worker ini
+        const error = new Error(
+          `[${this.name}] Output worker tidak valid: ${e.message}`
+        );
+        const id = recoverId(line);
+        const ids = worker.pending.has(id) ? [id] : [...worker.pending.keys()];
+        for (const pendingId of ids) this.settle(worker, pendingId).reject(error);
+        return;
+      }
+      if (!worker.pending.has(response.id)) return;
+      const job = this.settle(worker, response.id);
+      delete response.id;
+      job.resolve(response);
+    });
+
+    proc.stdin.on("error", (err) => {
+      console.error(`[${this.name}] Gagal kirim ke worker: ${err.message}`);
+    });
+
+    proc.stderr.on("data", (data) => {
+      console.error(`Model stderr: ${data.toString().trim()}`);
+    });
+
+    const onExit = (reason) => {
+      if (this.workers[slot] === worker) this.workers[slot] = null;
+      for (const id of [...worker.pending.keys()]) {
+        this.settle(worker, id).reject(
+          new Error(`[${this.name}] Worker berhenti: ${reason}`)
+        );
+      }
+    };
+    proc.on("exit", (code, signal) => onExit(signal || `exit code ${code}`));
+    proc.on("error", (err) => onExit(err.message));
+
+    this.workers[slot] = worker;
+    return worker;
+  }
+
+  // Keluarkan job dari antrian worker dan hentikan timer-nya
+  settle(worker, id) {
+    const job = worker.pending.get(id);
+    worker.pending.delete(id);
+    clearTimeout(job.timer);
+    return job;
+  }
+
+  getWorker(slot) {
+    return this.workers[slot] || this.spawnWorker(slot);
+  }
+
+  // Tanpa key: worker dengan antrian paling sedikit.
+  // Dengan key (mis. nama file model): worker yang sama untuk key yang sama, supaya
+  // model cukup di-cache di satu proses dan request-nya bisa digabung jadi micro-batch.
+  // Pindah ke worker paling lengang kalau antrian worker afinitas terlalu panjang,
+  // kecuali strict: request yang bergantung pada state di proses worker (stream, layout
+  // JMR) harus selalu ke worker afinitasnya.
+  pickWorker(key, strict = false) {
+    const workers = this.workers.map((_, slot) => this.getWorker(slot));
+    const leastBusy = workers.reduce((a, b) =>
+      a.pending.size <= b.pending.size ? a : b
+    );
+    if (key === undefined) return leastBusy;
+    const preferred = workers[hashKey(String(key)) % this.size];
+    if (strict) return preferred;
+    return preferred.pending.size - leastBusy.pending.size >
+      AFFINITY_MAX_EXTRA_PENDING
+      ? leastBusy
+      : preferred;
+  }
+
+  request(payload, key, { strict = false } = {}) {
+    if (this.closed) {
+      return Promise.reject(new Error(`[${this.name}] Pool sudah ditutup`));
+    }
+    return new Promise((resolve, reject) => {
+      const worker = this.pickWorker(key, strict);
+      const id = this.nextId++;
+      const timer = setTimeout(() => {
+        if (!worker.pending.has(id)) return;
+        this.settle(worker, id).reject(
+          new Error(
+            `[${this.name}] Request ${id} timeout setelah ${this.timeoutMs} ms`
+          )
+        );
+      }, this.timeoutMs);
+      worker.pending.set(id, { resolve, reject, timer });
+      worker.proc.stdin.write(JSON.stringify({ ...payload, id }) + "\n");
+    });
+  }
+
+  close() {
+    this.closed = true;
+    for (const worker of this.workers) {
+      if (worker) worker.proc.stdin.end();
+    }
+    this.workers.fill(null);
+  }
+}
+
+const predictionPool = new PythonWorkerPool("models/prediction.py", {
+  size: parseInt(process.env.PREDICTION_WORKERS || "2", 10),
+  name: "prediction",
+});
+
+// Worker jmr_proxy_model.py, snapshot dengan layout sensor sama digabung ke predict_batch
+const jmrPool = new PythonWorkerPool("models/jmr_proxy_model.py", {
+  size: parseInt(process.env.JMR_WORKERS || "1", 10),
+  name: "jmr",
+});
+
+// Worker agregasi playback (bucket psi per tanggal x spot dengan numpy)
+const playbackPool = new PythonWorkerPool("models/playback_aggregate.py", {
+  size: parseInt(process.env.PLAYBACK_WORKERS || "1", 10),
+  name: "playback",
+});
+
+emitter.on("server:stopped", () => {
+  predictionPool.close();
+  jmrPool.close();
+  playbackPool.close();
+});
+
+export { PythonWorkerPool, jmrPool, playbackPool };
+export default predictionPool;